@@ -0,0 +1,227 @@
+"""
+Local HTTP job API for redaction, backed by the queue in core/jobs.py.
+
+    python api.py [--host 127.0.0.1] [--port 8600] [--workers 4]
+
+    POST /jobs?kind=extract&file_name=a.pdf[&file_type=scanned_pdf]     body: the file
+    POST /jobs?kind=redact&source=<extract job id>&types=Name,Email[&remove_face=1]
+    POST /jobs?kind=redact&file_name=a.pdf&types=Name,Email             body: the file
+    GET  /jobs/<id>           status, progress and result as JSON
+    GET  /jobs/<id>/events    server-sent events on every change until the job finishes
+    GET  /jobs/<id>/result    the redacted file
+    GET  /health              job counts by status
+
+--workers starts worker processes alongside the API (default: CPU count);
+with --workers 0 only the API runs and `python worker.py` supplies the
+workers. API instances and workers pointing at the same REDACT_JOBS_DIR share
+one queue.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from core.entities import IdentifierType
+from core.jobs import FILE_TYPES, FINISHED, JOBS_DIR, JobStore, start_workers
+
+MAX_UPLOAD_BYTES = int(os.environ.get("REDACT_API_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+EXTENSION_TYPES = {".pdf": "pdf", ".png": "image", ".jpg": "image", ".jpeg": "image"}
+EVENT_POLL_SECONDS = 0.5
+# Comment lines keep idle event streams from being closed by proxies
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def public_job(job: dict) -> dict:
+    return {
+        key: job[key]
+        for key in ("id", "kind", "status", "file_name", "file_type", "params", "progress", "result", "error", "created", "updated")
+    }
+
+
+def make_handler(store: JobStore):
+    valid_types = {t.value for t in IdentifierType}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} {format % args}")
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id: str) -> dict:
+            job = store.get(job_id)
+            if job is None:
+                raise ApiError(404, f"No job {job_id}")
+            return job
+
+        def _dispatch(self, routes: dict):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                for (length, head, tail), route in routes.items():
+                    if len(parts) == length and parts[0] == head and (tail is None or parts[-1] == tail):
+                        return route(parts, query)
+                raise ApiError(404, f"No route for {url.path}")
+            except ApiError as e:
+                self._send_json(e.status, {"error": str(e)})
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_GET(self):
+            self._dispatch({
+                (1, "health", None): lambda parts, query: self._send_json(200, {"jobs": store.counts()}),
+                (2, "jobs", None): lambda parts, query: self._send_json(200, public_job(self._job(parts[1]))),
+                (3, "jobs", "events"): lambda parts, query: self._events(parts[1]),
+                (3, "jobs", "result"): lambda parts, query: self._result(parts[1]),
+            })
+
+        def do_POST(self):
+            self._dispatch({(1, "jobs", None): lambda parts, query: self._submit(query)})
+
+        def _read_body(self) -> bytes:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_UPLOAD_BYTES:
+                raise ApiError(413, f"Uploads are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+            return self.rfile.read(length) if length else b""
+
+        def _types(self, query: dict) -> list[str]:
+            types = [t.strip() for t in query.get("types", "").split(",") if t.strip()]
+            unknown = [t for t in types if t not in valid_types]
+            if unknown:
+                raise ApiError(400, f"Unknown identifier types: {', '.join(unknown)}")
+            if not types:
+                raise ApiError(400, "types is required for redact jobs")
+            return types
+
+        def _submit(self, query: dict):
+            kind = query.get("kind")
+            if kind not in ("extract", "redact"):
+                raise ApiError(400, "kind must be extract or redact")
+            body = self._read_body()
+            params = {}
+            if kind == "redact":
+                params = {"types": self._types(query), "remove_picture": query.get("remove_face") in ("1", "true")}
+
+            source = query.get("source")
+            if kind == "redact" and source:
+                source_job = self._job(source)
+                if source_job["kind"] != "extract" or source_job["status"] != "done":
+                    raise ApiError(409, f"Source job {source} is not a finished extract job")
+                params["source"] = source
+                job_id = store.submit(
+                    kind,
+                    source_job["file_name"],
+                    source_job["file_type"],
+                    params,
+                    input_path=source_job["input_path"],
+                )
+            else:
+                file_name = os.path.basename(query.get("file_name", ""))
+                ext = os.path.splitext(file_name)[1].lower()
+                if ext not in EXTENSION_TYPES:
+                    raise ApiError(400, f"file_name must end in one of {', '.join(EXTENSION_TYPES)}")
+                file_type = query.get("file_type") or EXTENSION_TYPES[ext]
+                if file_type not in FILE_TYPES:
+                    raise ApiError(400, f"file_type must be one of {', '.join(sorted(FILE_TYPES))}")
+                if not body:
+                    raise ApiError(400, "The request body must be the file")
+                job_id = store.submit(kind, file_name, file_type, params, file_bytes=body)
+
+            self._send_json(202, {"id": job_id, "status": "queued"})
+
+        def _events(self, job_id: str):
+            job = self._job(job_id)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            last_updated = None
+            last_sent = time.monotonic()
+            while True:
+                if job["updated"] != last_updated:
+                    last_updated = job["updated"]
+                    self.wfile.write(f"data: {json.dumps(public_job(job), ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= EVENT_KEEPALIVE_SECONDS:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                if job["status"] in FINISHED:
+                    return
+                time.sleep(EVENT_POLL_SECONDS)
+                job = self._job(job_id)
+
+        def _result(self, job_id: str):
+            job = self._job(job_id)
+            if job["status"] == "failed":
+                raise ApiError(409, f"Job failed: {job['error']}")
+            path = store.output_path(job)
+            if path is None:
+                raise ApiError(409, f"Job is {job['status']} and has no file yet")
+            size = os.path.getsize(path)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            with open(path, "rb") as f:
+                while block := f.read(1024 * 1024):
+                    self.wfile.write(block)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the redaction job API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes to start (default: CPU count)")
+    parser.add_argument("--jobs-dir", default=JOBS_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Stop the workers on SIGTERM too, not only on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    store = JobStore(args.jobs_dir)
+    workers = start_workers(os.cpu_count() or 1 if args.workers is None else args.workers, args.jobs_dir)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    server.daemon_threads = True
+    logging.info(f"Job API on http://{args.host}:{server.server_port} with {len(workers)} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
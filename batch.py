@@ -0,0 +1,220 @@
+"""
+Headless bulk redaction without the Streamlit UI.
+
+    python batch.py INPUT_DIR OUTPUT_DIR --types "Name,Email,Government ID Number" [--workers 8] [--remove-face]
+
+The Groq API key is read from GROQ_API_KEY. Finished files are recorded in
+OUTPUT_DIR/manifest.jsonl by content hash, path, types and face option, so
+re-running the same command only processes new, changed or failed files.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import (
+    read_image,
+    read_pdf,
+    read_scanned_pdf,
+    search_replace_in_image,
+    search_replace_in_pdf,
+    search_replace_in_scanned_pdf,
+)
+from core import metrics
+from core.entities import IdentifierType, extract_entities, raise_error
+from core.llm_scheduler import llm_scheduler
+
+MANIFEST_NAME = "manifest.jsonl"
+SUPPORTED_EXTENSIONS = {".pdf": "pdf", ".png": "image", ".jpg": "image", ".jpeg": "image"}
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def find_files(input_dir: str, exclude_dir: str | None = None) -> list[str]:
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    paths = []
+    for root, dirs, names in os.walk(input_dir):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude_dir]
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def manifest_key(digest: str, types: list[str], remove_picture: bool, rel_path: str) -> tuple:
+    """Everything an output depends on; a file is redone when any of it changes."""
+    return digest, tuple(sorted(types)), bool(remove_picture), rel_path
+
+
+def load_manifest(path: str) -> dict[tuple, dict]:
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a torn last line; that file is simply redone
+                continue
+            if entry.get("status") == "done" and "types" in entry:
+                key = manifest_key(entry["digest"], entry["types"], entry.get("remove_picture", False), entry["path"])
+                done[key] = entry
+    return done
+
+
+def redact_file(path: str, digest: str, input_dir: str, output_dir: str, types: list[str], remove_picture: bool) -> dict:
+    started = time.perf_counter()
+    file_type = SUPPORTED_EXTENSIONS[os.path.splitext(path)[1].lower()]
+
+    rel_path = os.path.relpath(path, input_dir)
+    name, ext = os.path.splitext(rel_path)
+    out_path = os.path.abspath(os.path.join(output_dir, f"{name}_redacted{ext}"))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    # Read once; every stage below works on the in-memory copy
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+
+    if file_type == "pdf":
+        text = read_pdf(file_bytes)
+        if not text.strip():
+            file_type = "scanned_pdf"
+            text = read_scanned_pdf(file_bytes, workers=1)
+    else:
+        text = read_image(file_bytes)
+
+    # A chunk the LLM failed on may hold entities: fail the file rather than
+    # record it as done with them left in
+    identifiers = extract_entities(text, on_error=raise_error, requested_types=types)
+    words = [obj.objValue for obj in identifiers if obj.objType.value in types]
+
+    match file_type:
+        case "pdf":
+            search_replace_in_pdf(file_bytes, words, remove_picture, out_path)
+        case "scanned_pdf":
+            search_replace_in_scanned_pdf(file_bytes, words, remove_picture, out_path, workers=1)
+        case "image":
+            if search_replace_in_image(file_bytes, words, remove_picture, out_path) is None:
+                raise ValueError("Failed to redact image")
+
+    return {
+        "path": rel_path,
+        "digest": digest,
+        "types": sorted(types),
+        "remove_picture": remove_picture,
+        "status": "done",
+        "output": os.path.relpath(out_path, output_dir),
+        "file_type": file_type,
+        "identifiers": len(identifiers),
+        "redacted": len(words),
+        "bytes": len(file_bytes),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _share_llm_budget(workers: int):
+    # Each worker process has its own scheduler; split the quota between them
+    llm_scheduler.configure(llm_scheduler.rpm / workers, llm_scheduler.tpm / workers)
+
+
+def run_batch(input_dir: str, output_dir: str, types: list[str], remove_picture: bool = False, workers: int | None = None) -> dict:
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+
+    pending = {}
+    skipped = 0
+    for path in find_files(input_dir, exclude_dir=output_dir):
+        digest = file_digest(path)
+        if manifest_key(digest, types, remove_picture, os.path.relpath(path, input_dir)) in done:
+            skipped += 1
+        else:
+            pending[path] = digest
+
+    logging.info(f"{len(pending)} files to redact, {skipped} already done")
+
+    started = time.perf_counter()
+    succeeded = failed = total_bytes = 0
+    workers = workers or os.cpu_count() or 1
+    with open(manifest_path, "a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+        max_workers=workers, initializer=_share_llm_budget, initargs=(workers,)
+    ) as executor:
+        # Smallest files first: they finish quickly and hold less of the LLM budget
+        futures = {
+            executor.submit(metrics.collect, redact_file, path, digest, input_dir, output_dir, types, remove_picture): path
+            for path, digest in sorted(pending.items(), key=lambda item: os.path.getsize(item[0]))
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entry, recorded = future.result()
+                metrics.merge(recorded)
+                succeeded += 1
+                total_bytes += entry["bytes"]
+                logging.info(f"Redacted {entry['path']} in {entry['seconds']}s")
+            except Exception as e:
+                entry = {
+                    "path": os.path.relpath(path, input_dir),
+                    "digest": pending[path],
+                    "types": sorted(types),
+                    "remove_picture": remove_picture,
+                    "status": "failed",
+                    "error": str(e),
+                }
+                failed += 1
+                logging.error(f"Failed to redact {entry['path']}: {e}")
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": succeeded,
+        "failed": failed,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(succeeded / elapsed, 3) if elapsed > 0 else 0.0,
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 3) if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redact PII from every PDF and image in a directory.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument(
+        "--types",
+        required=True,
+        help="Comma separated identifier types to redact, e.g. 'Name,Email'. "
+        f"Available: {', '.join(t.value for t in IdentifierType)}",
+    )
+    parser.add_argument("--remove-face", action="store_true", help="Also black out detected faces")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    types = [t.strip() for t in args.types.split(",") if t.strip()]
+    valid_types = {t.value for t in IdentifierType}
+    unknown = [t for t in types if t not in valid_types]
+    if unknown:
+        parser.error(f"Unknown identifier types: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_batch(args.input_dir, args.output_dir, types, args.remove_face, args.workers)
+    metrics.export()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
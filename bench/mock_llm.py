@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockChatServer:
+    """
+    Local stand-in for an OpenAI/Groq style chat-completions endpoint and
+    Ollama's /api/chat.
+
+    Every POST ending in /chat/completions or /api/chat sleeps `latency`
+    seconds and answers with `respond(user_text)`, which must return the
+    assistant message content. Requests with "stream": true get the answer
+    in `stream_chunks` pieces, as SSE or NDJSON respectively.
+    """
+
+    def __init__(self, respond, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0, stream_chunks: int = 8):
+        self.respond = respond
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                ollama = self.path.endswith("/api/chat")
+                if not (ollama or self.path.endswith("/chat/completions")):
+                    self.send_error(404)
+                    return
+
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                user_text = next((m["content"] for m in body.get("messages", []) if m["role"] == "user"), "")
+                content = server.respond(user_text)
+                model = body.get("model", "mock")
+
+                if body.get("stream"):
+                    step = max(1, -(-len(content) // server.stream_chunks))
+                    pieces = [content[i:i + step] for i in range(0, len(content), step)]
+                    if ollama:
+                        lines = [json.dumps({"model": model, "message": {"role": "assistant", "content": p}, "done": False}) for p in pieces]
+                        lines.append(json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                                                 "prompt_eval_count": 0, "eval_count": 0}))
+                        self._send("application/x-ndjson", "\n".join(lines) + "\n")
+                    else:
+                        events = [
+                            "data: " + json.dumps({"id": f"mock-{server.requests}", "model": model, "choices": [{"index": 0, "delta": {"content": p}}]})
+                            for p in pieces
+                        ]
+                        if (body.get("stream_options") or {}).get("include_usage"):
+                            events.append("data: " + json.dumps({
+                                "id": f"mock-{server.requests}", "model": model, "choices": [],
+                                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                            }))
+                        events.append("data: [DONE]")
+                        self._send("text/event-stream", "\n\n".join(events) + "\n\n")
+                    return
+
+                if ollama:
+                    payload = {"model": model, "message": {"role": "assistant", "content": content}, "done": True,
+                               "prompt_eval_count": 0, "eval_count": 0}
+                else:
+                    payload = {
+                        "id": f"mock-{server.requests}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    }
+                self._send("application/json", json.dumps(payload))
+
+            def _send(self, content_type: str, body: str):
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,98 @@
+import json
+import random
+
+import cv2
+import fitz
+import numpy as np
+
+from core.local_detector import _VERHOEFF_D, _VERHOEFF_P
+
+FIRST_NAMES = ["Aarav", "Priya", "Karthik", "Lakshmi", "Rahul", "Meena", "Arjun", "Divya", "Suresh", "Anita"]
+LAST_NAMES = ["Sharma", "Iyer", "Reddy", "Nair", "Gupta", "Pillai", "Singh", "Menon", "Rao", "Das"]
+CITIES = ["Chennai", "Mumbai", "Delhi", "Bengaluru", "Kolkata", "Hyderabad", "Pune", "Madurai"]
+FILLER = (
+    "This document is issued for identification purposes and must be produced on request. "
+    "The holder is responsible for keeping the information up to date with the issuing office. "
+)
+
+
+def verhoeff_check_digit(number: str) -> str:
+    checksum = 0
+    for i, digit in enumerate(reversed(number)):
+        checksum = _VERHOEFF_D[checksum, _VERHOEFF_P[(i + 1) % 8, int(digit)]]
+    inverse = [0, 4, 3, 2, 1, 5, 6, 7, 8, 9]
+    return str(inverse[checksum])
+
+
+def make_person(rng: random.Random) -> dict:
+    base = str(rng.randint(2, 9)) + "".join(str(rng.randint(0, 9)) for _ in range(10))
+    aadhaar = base + verhoeff_check_digit(base)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "Name": f"{first} {last}",
+        "Email": f"{first.lower()}.{last.lower()}{rng.randint(1, 99)}@example.com",
+        "Phone number": f"{rng.randint(6, 9)}{rng.randint(0, 999999999):09d}",
+        "Government ID Number": f"{aadhaar[:4]} {aadhaar[4:8]} {aadhaar[8:]}",
+        "Date of Birth": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}",
+        "PIN Code": f"{rng.randint(1, 8)}{rng.randint(0, 99999):05d}",
+        "Address": f"{rng.randint(1, 200)} Main Road {rng.choice(CITIES)}",
+    }
+
+
+def person_lines(person: dict) -> list[str]:
+    return [
+        f"Name: {person['Name']}",
+        f"DOB: {person['Date of Birth']}",
+        f"Aadhaar: {person['Government ID Number']}",
+        f"Mobile: {person['Phone number']}",
+        f"Email: {person['Email']}",
+        f"Address: {person['Address']} {person['PIN Code']}",
+    ]
+
+
+def make_text_pdf(pages: int, rng: random.Random) -> tuple[bytes, list[dict]]:
+    people = []
+    with fitz.open() as doc:
+        for _ in range(pages):
+            person = make_person(rng)
+            people.append(person)
+            page = doc.new_page()
+            text = "\n".join(person_lines(person)) + "\n\n" + FILLER * 6
+            page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=11)
+        return doc.tobytes(), people
+
+
+def make_scanned_pdf(pages: int, dpi: int, rng: random.Random) -> tuple[bytes, list[dict]]:
+    text_pdf, people = make_text_pdf(pages, rng)
+    with fitz.open(stream=text_pdf, filetype="pdf") as src, fitz.open() as out:
+        for page in src.pages():
+            pix = page.get_pixmap(dpi=dpi)
+            scanned = out.new_page(width=page.rect.width, height=page.rect.height)
+            scanned.insert_image(scanned.rect, stream=pix.tobytes("png"))
+        return out.tobytes(), people
+
+
+def make_id_card(width: int, height: int, rng: random.Random) -> tuple[bytes, list[dict]]:
+    person = make_person(rng)
+    img = np.full((height, width, 3), 245, dtype=np.uint8)
+    scale = width / 1000
+    cv2.rectangle(img, (int(30 * scale), int(30 * scale)), (int(260 * scale), int(330 * scale)), (180, 180, 180), -1)
+    y = int(70 * scale)
+    for line in person_lines(person):
+        cv2.putText(img, line, (int(300 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, 0.8 * scale, (20, 20, 20), max(1, int(2 * scale)))
+        y += int(50 * scale)
+    ok, encoded = cv2.imencode(".png", img)
+    return encoded.tobytes(), [person]
+
+
+def mock_response(people: list[dict]):
+    """
+    Build a chat-completions responder that returns the known PII present in the prompt text.
+    """
+    known = [(value, obj_type) for person in people for obj_type, value in person.items()]
+
+    def respond(user_text: str) -> str:
+        found = [{"value": value, "type": obj_type} for value, obj_type in known if value in user_text]
+        return json.dumps(found)
+
+    return respond
@@ -1,2 +1,3 @@
 from .handle_images import read_image, search_replace_in_image
 from .handle_pdf import read_pdf, search_replace_in_pdf
+from .handle_scanned_pdf import read_scanned_pdf, search_replace_in_scanned_pdf
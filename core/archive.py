@@ -0,0 +1,45 @@
+import os
+import zipfile
+
+# Redacted PDFs, JPEGs and PNGs are already compressed; deflating them again
+# costs CPU for a few bytes at best.
+STORED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
+
+
+class ZipBuilder:
+    """
+    ZIP archive on disk that redacted files are appended to as they finish.
+
+    Each file is copied into the archive in chunks by `zipfile`, so neither
+    the inputs nor the archive are ever held in memory as a whole.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._names: set[str] = set()
+
+    def _unique_name(self, name: str) -> str:
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in self._names:
+            candidate = f"{stem} ({n}){ext}"
+            n += 1
+        self._names.add(candidate)
+        return candidate
+
+    def add(self, file_path: str, arcname: str | None = None):
+        arcname = self._unique_name(arcname or os.path.basename(file_path))
+        ext = os.path.splitext(arcname)[1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        self._zip.write(file_path, arcname, compress_type=compress_type)
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
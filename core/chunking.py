@@ -0,0 +1,73 @@
+PAGE_SEPARATOR = "\n\n"
+
+
+def _split_long_page(page: str, max_chars: int) -> list[str]:
+    pieces = []
+    current = ""
+    for line in page.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            cut = line.rfind(" ", 0, max_chars) + 1 or max_chars
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _overlap_tail(chunk: str, overlap: int) -> str:
+    if overlap <= 0 or len(chunk) <= overlap:
+        return chunk if overlap > 0 else ""
+    tail = chunk[-overlap:]
+    # Start the overlap on a word boundary so a split token is not sent as a fragment
+    space = tail.find(" ")
+    newline = tail.find("\n")
+    cut = min(i for i in (space, newline, len(tail)) if i >= 0)
+    return tail[cut:].lstrip()
+
+
+def chunk_text(text: str, max_chars: int = 12000, overlap: int = 400, separator: str = PAGE_SEPARATOR) -> list[str]:
+    """
+    Split extracted document text into chunks of at most `max_chars` characters.
+
+    Pages (separated by `separator`) are kept whole where possible and packed
+    together; each chunk after the first starts with the last `overlap`
+    characters of the previous one, so entities on a chunk boundary are seen whole.
+    """
+    if max_chars <= overlap + len(separator):
+        raise ValueError("max_chars must be larger than overlap")
+    if not text.strip():
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    page_limit = max(1, max_chars - overlap - len(separator))
+    pages = []
+    for page in text.split(separator):
+        if not page.strip():
+            continue
+        if len(page) > page_limit:
+            pages.extend(_split_long_page(page, page_limit))
+        else:
+            pages.append(page)
+
+    chunks = []
+    current = ""
+    for page in pages:
+        candidate = f"{current}{separator}{page}" if current else page
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        chunks.append(current)
+        tail = _overlap_tail(current, overlap)
+        current = f"{tail}{separator}{page}" if tail else page
+
+    if current:
+        chunks.append(current)
+    return chunks
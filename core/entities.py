@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from enum import Enum
+
+from pydantic import BaseModel, ValidationError
+
+from core import local_detector, metrics
+from core.chunking import chunk_text
+from core.llm_backends import ClientBackend, LLMBackend, backend_from_env
+from core.llm_cache import EntityCache, make_entity_key
+from core.llm_scheduler import estimate_tokens, llm_scheduler
+from core.stream_parser import JsonObjectStreamParser
+from prompt import pii_prompt
+
+LLM_CONCURRENCY = int(os.environ.get("REDACT_LLM_CONCURRENCY", "4"))
+LLM_CHUNK_CHARS = int(os.environ.get("REDACT_LLM_CHUNK_CHARS", "12000"))
+LLM_CHUNK_OVERLAP = int(os.environ.get("REDACT_LLM_CHUNK_OVERLAP", "400"))
+LOCAL_DETECTION = os.environ.get("REDACT_LOCAL_DETECTION", "1") != "0"
+LLM_STREAM = os.environ.get("REDACT_LLM_STREAM", "0") == "1"
+
+entity_cache = EntityCache(
+    os.environ.get("REDACT_ENTITY_CACHE", os.path.join(".cache", "entities.sqlite3")),
+    ttl_seconds=int(os.environ.get("REDACT_ENTITY_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.environ.get("REDACT_ENTITY_CACHE_ENTRIES", "10000")),
+)
+
+_backend: LLMBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def set_backend(backend: LLMBackend):
+    global _backend
+    _backend = backend
+
+
+def set_client(client):
+    """Use an SDK client (e.g. `groq.Groq`) instead of a configured backend."""
+    set_backend(ClientBackend(client))
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_env()
+    return _backend
+
+
+class IdentifierType(str, Enum):
+    EMAIL = "Email"
+    GOVERNMENT_ID = "Government ID Number"
+    NAME = "Name"
+    PHONE_NUMBER = "Phone number"
+    ADDRESS = "Address"
+    UNKNOWN = "Unknown"
+    ENROLMENT_NO = "Enrolment No."
+    FATHERS_NAME = "Father Name"
+    SURNAME = "Surname"
+    VID = "VID"
+    DATE_OF_BIRTH = "Date of Birth"
+    PLACE_OF_BIRTH = "Place of Birth"
+    DATE_OF_EXPIRY = "Date of Expiry"
+    DATE = "Date"
+    AADHAAR_ISSUE_DATE = "Aadhaar Issue Date"
+    PIN_CODE = "PIN Code"
+    Place_of_Issue = "Place of Issue"
+    SubDistrict="Sub District"
+
+
+class Identifier(BaseModel):
+    objValue: str
+    objType: IdentifierType
+
+
+class IdentifiersCollection(BaseModel):
+    identifier: list[Identifier]
+
+
+def item_to_identifiers(item: dict) -> list[Identifier]:
+    obj_value = item.get("value", "")
+    obj_type = item.get("type", "Unknown")
+
+    if obj_type == "Given Name":
+        obj_type = "Name"
+
+    if re.match(r'\d{2}/\d{2}/\d{4}', obj_value) or re.match(r'\d{4}-\d{2}-\d{2}', obj_value):
+        obj_type = "Date of Birth"
+
+    if re.match(r'^\d{4} \d{4} \d{4}$', obj_value):
+        obj_type = "Government ID Number"
+
+    if re.match(r'\d{4}', obj_value):
+        obj_type = "Government ID Number"
+
+    try:
+        if obj_type in ["Name", "Phone number", "Government ID Number", "Address"]:
+            identifiers = [Identifier(objValue=part, objType=obj_type) for part in obj_value.split()]
+        else:
+            identifiers = [Identifier(objValue=obj_value, objType=obj_type)]
+    except ValidationError as e:
+        logging.warning(f"Skipping entity with unsupported type {obj_type!r}: {e.error_count()} errors")
+        return []
+
+    for identifier in identifiers:
+        logging.debug(f"Extracted PII: {identifier}")
+    return identifiers
+
+
+def parse_entities(resp_data: str) -> list[Identifier]:
+    normalized = resp_data.replace("'", '"')
+    normalized = normalized.replace(r'\"', '"')
+
+    try:
+        parsed_data = json.loads(normalized)
+    except json.JSONDecodeError as e:
+        # Keep whatever complete objects precede the damage
+        logging.error(f"Error parsing JSON response: {e}")
+        parsed_data = JsonObjectStreamParser().feed(resp_data)
+
+    identifiers = []
+    for item in parsed_data:
+        if isinstance(item, dict):
+            identifiers.extend(item_to_identifiers(item))
+    return identifiers
+
+
+def _stream_completion(
+    backend: LLMBackend, text: str, on_entities=None, on_usage=None
+) -> tuple[list[Identifier], str, bool]:
+    parser = JsonObjectStreamParser()
+    parts = []
+    identifiers = []
+    complete = False
+    try:
+        for delta in backend.stream(pii_prompt, text, on_usage):
+            parts.append(delta)
+            for item in parser.feed(delta):
+                new_identifiers = item_to_identifiers(item)
+                identifiers.extend(new_identifiers)
+                if on_entities is not None and new_identifiers:
+                    on_entities(new_identifiers)
+        complete = True
+    except Exception as e:
+        if not identifiers:
+            raise
+        logging.error(f"LLM stream broke off after {len(identifiers)} entities: {e}")
+    return identifiers, "".join(parts).strip(), complete
+
+
+def _record_usage(reserved: int, prompt_tokens: int | None, completion_tokens: int | None):
+    if prompt_tokens is not None and completion_tokens is not None:
+        llm_scheduler.settle(reserved, prompt_tokens + completion_tokens)
+    if prompt_tokens is not None:
+        metrics.inc("redact_llm_tokens", prompt_tokens, kind="prompt")
+    if completion_tokens is not None:
+        metrics.inc("redact_llm_tokens", completion_tokens, kind="completion")
+
+
+def extract_entities_from_chunk(text: str, on_entities=None, priority: float | None = None) -> list[Identifier]:
+    backend = get_backend()
+    cache_key = make_entity_key(text, backend.cache_id, pii_prompt)
+    resp_data = entity_cache.get(cache_key)
+    if resp_data is not None:
+        metrics.inc("redact_cache_hits", cache="entities")
+        identifiers = parse_entities(resp_data)
+        if on_entities is not None and identifiers:
+            on_entities(identifiers)
+        return identifiers
+    metrics.inc("redact_cache_misses", cache="entities")
+
+    with metrics.span("llm_queue"):
+        reserved = llm_scheduler.acquire(estimate_tokens(pii_prompt) + estimate_tokens(text), priority)
+
+    if LLM_STREAM:
+        with metrics.span("llm"):
+            identifiers, resp_data, complete = _stream_completion(
+                backend,
+                text,
+                on_entities,
+                on_usage=lambda prompt_tokens, completion_tokens: _record_usage(reserved, prompt_tokens, completion_tokens),
+            )
+    else:
+        with metrics.span("llm"):
+            resp = backend.complete(pii_prompt, text)
+        _record_usage(reserved, resp.prompt_tokens, resp.completion_tokens)
+        logging.debug(f"API response {resp.id}")
+
+        resp_data = resp.content.strip()
+        identifiers = parse_entities(resp_data)
+        complete = True
+        if on_entities is not None and identifiers:
+            on_entities(identifiers)
+
+    metrics.inc("redact_entities", len(identifiers), source="llm")
+    # Don't pin a malformed or truncated response in the cache for the whole TTL
+    if complete and (identifiers or resp_data == "[]"):
+        entity_cache.put(cache_key, resp_data)
+    return identifiers
+
+
+def merge_identifiers(results: list[list[Identifier]]) -> list[Identifier]:
+    seen = set()
+    merged = []
+    for identifiers in results:
+        for identifier in identifiers:
+            key = (identifier.objValue, identifier.objType)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(identifier)
+    return merged
+
+
+def _drain(partial: queue.Queue, on_entities):
+    while True:
+        try:
+            identifiers = partial.get_nowait()
+        except queue.Empty:
+            return
+        on_entities(identifiers)
+
+
+def raise_error(error: Exception):
+    """`on_error` for callers that must not keep a partial extraction."""
+    raise error
+
+
+def extract_entities(
+    text: str,
+    on_error=None,
+    requested_types: list[str] | None = None,
+    on_entities=None,
+) -> list[Identifier]:
+    """
+    Structured identifiers are found locally first. When every requested type
+    is one the local detector finds completely (`LOCAL_TYPES`) the LLM is
+    skipped; otherwise only the text left after removing local matches is
+    sent to it.
+
+    `on_entities` is called from the calling thread with each batch of
+    identifiers as soon as it is known, before the full result is merged.
+
+    When some chunks fail the others are still returned, after `on_error` is
+    called with the first failure; pass `raise_error` to fail instead.
+    """
+    matches = local_detector.detect(text) if LOCAL_DETECTION else []
+    local_identifiers = local_detector.to_identifiers(matches, Identifier)
+    metrics.inc("redact_entities", len(local_identifiers), source="local")
+    if on_entities is not None and local_identifiers:
+        on_entities(local_identifiers)
+    if LOCAL_DETECTION and requested_types is not None and set(requested_types) <= local_detector.LOCAL_TYPES:
+        return merge_identifiers([local_identifiers])
+
+    llm_text = local_detector.strip_detected(text, matches) if matches else text
+    chunks = chunk_text(llm_text, max_chars=LLM_CHUNK_CHARS, overlap=LLM_CHUNK_OVERLAP)
+    if not chunks:
+        return merge_identifiers([local_identifiers])
+
+    results = [[] for _ in chunks]
+    errors = []
+    # Workers hand partial results to the calling thread, which is the only
+    # one allowed to run on_entities (Streamlit elements can't be updated
+    # from pool threads).
+    partial = queue.Queue() if on_entities is not None else None
+    chunk_callback = partial.put if partial is not None else None
+
+    # Every chunk queues behind the whole document's size, so when several
+    # uploads compete for the LLM budget the smallest document finishes first
+    priority = estimate_tokens(llm_text)
+
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(chunks))) as executor:
+        futures = {
+            executor.submit(extract_entities_from_chunk, chunk, chunk_callback, priority): i
+            for i, chunk in enumerate(chunks)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if partial is not None:
+                _drain(partial, on_entities)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logging.error(f"Unexpected error in chunk {futures[future] + 1}/{len(chunks)}: {e}")
+                    errors.append(e)
+        if partial is not None:
+            _drain(partial, on_entities)
+
+    if errors:
+        if len(errors) == len(chunks) and not local_identifiers:
+            raise errors[0]
+        if on_error is not None:
+            on_error(errors[0])
+
+    logging.debug(f"Entity cache: {entity_cache.stats()}")
+    return merge_identifiers([local_identifiers] + results)
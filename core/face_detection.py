@@ -0,0 +1,68 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+CASCADE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "haarcascade_frontalface_default.xml"
+)
+DETECTION_MAX_SIDE = int(os.environ.get("REDACT_FACE_MAX_SIDE", "1024"))
+
+_local = threading.local()
+
+
+def get_classifier() -> cv2.CascadeClassifier:
+    # CascadeClassifier is not safe to share between threads, so each thread
+    # loads the XML once and keeps its own instance.
+    classifier = getattr(_local, "classifier", None)
+    if classifier is None:
+        path = CASCADE_PATH
+        if not os.path.exists(path):
+            path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        classifier = cv2.CascadeClassifier(path)
+        if classifier.empty():
+            raise RuntimeError(f"Could not load face cascade from {path}")
+        _local.classifier = classifier
+    return classifier
+
+
+def detect_faces(pic: cv2.typing.MatLike, max_side: int = DETECTION_MAX_SIDE) -> np.ndarray:
+    """
+    Face boxes as (x, y, w, h) rows in `pic` coordinates.
+    Detection runs on a copy downscaled so its longest side is at most `max_side`.
+    """
+    gray = pic if pic.ndim == 2 else cv2.cvtColor(pic, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape[:2]
+    scale = 1.0
+    if max_side and max(height, width) > max_side:
+        scale = max_side / max(height, width)
+        gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+    faces = get_classifier().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+    if len(faces) == 0:
+        return np.empty((0, 4), dtype=int)
+    if scale != 1.0:
+        faces = np.rint(np.asarray(faces) / scale).astype(int)
+    return faces
+
+
+class FaceMemo:
+    """
+    Per-document memo of image xref -> whether it contains a face, so an image
+    repeated on many pages is extracted, decoded and scanned once.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self._results: dict[int, bool] = {}
+
+    def has_face(self, xref: int) -> bool:
+        result = self._results.get(xref)
+        if result is None:
+            base_image = self.doc.extract_image(xref)
+            img_array = np.frombuffer(base_image["image"], dtype=np.uint8)
+            img_cv = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+            result = img_cv is not None and len(detect_faces(img_cv)) > 0
+            self._results[xref] = result
+        return result
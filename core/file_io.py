@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+# A document can be handed to the read_*/search_replace_in_* functions either
+# as a path on disk or as the raw upload bytes.
+Source = str | bytes
+
+
+def is_bytes(source: Source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def read_source(source: Source) -> bytes:
+    if is_bytes(source):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def output_path(source: Source, red_file_name: str) -> str:
+    """
+    Where to write a redacted file: next to a path input (as before), or as
+    given for in-memory input.
+    """
+    if is_bytes(source):
+        return red_file_name
+    return os.path.join(os.path.dirname(source), red_file_name)
+
+
+class ScratchDir:
+    """
+    Private directory for one session's outputs.
+
+    Removed by `cleanup()`, when the object is garbage collected, or at
+    interpreter exit, whichever comes first.
+    """
+
+    def __init__(self, prefix: str = "redact-"):
+        self._tmp = tempfile.TemporaryDirectory(prefix=prefix)
+        self.path = self._tmp.name
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, os.path.basename(name))
+
+    def clear(self):
+        for entry in os.scandir(self.path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+
+    def cleanup(self):
+        self._tmp.cleanup()
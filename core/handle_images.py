@@ -1,178 +1,220 @@
-import itertools
-from operator import itemgetter
 import cv2
-import pytesseract
+import numpy as np
+from core import metrics
+from core.file_io import Source, read_source
+from core.matcher import SubstringMatcher
 from core.misc import BLACK, is_human_image
+from core.ocr_cache import make_ocr_key, ocr_cache
+from core.ocr_engine import recognize, select_languages
+from core.ocr_tokens import OcrTokens
+from core.tiled_ocr import ocr_tiled, should_tile
 
-pytesseract.pytesseract.tesseract_cmd = r'/opt/homebrew/bin/tesseract'
+def collate_lines(tokens: OcrTokens, line_ids: np.ndarray, tolerance: float, add_spaces: bool) -> list[str]:
+    """
+    Lay out each line left to right, padding with one space per `tolerance`
+    of horizontal gap when `add_spaces` is set.
+    """
+    order = np.lexsort((tokens.boxes[:, 0], line_ids))
+    ids = line_ids[order]
+    x0 = tokens.boxes[order, 0]
+    x1 = tokens.boxes[order, 2]
+    text = tokens.text[order]
+
+    line_starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    bounds = zip(line_starts.tolist(), np.append(line_starts[1:], len(ids)).tolist())
+    if not add_spaces:
+        return [" ".join(text[a:b].tolist()).strip() for a, b in bounds]
+
+    prev_x1 = np.concatenate(([0], x1[:-1]))
+    prev_x1[line_starts] = 0
+    if tolerance > 0:
+        gaps = np.maximum(0, np.ceil((x0 - prev_x1) / tolerance) - 1).astype(np.int64)
+    else:
+        gaps = np.zeros(len(ids), dtype=np.int64)
+    spaces = gaps + 1
+    spaces[line_starts] -= 1
+    pieces = np.char.add(np.char.multiply(" ", spaces), text).tolist()
+    return ["".join(pieces[a:b]) for a, b in bounds]
 
-def cluster_list(xs: list[int], tolerance: float = 0):
-    if tolerance == 0 or len(xs) < 2:
-        return [[x] for x in sorted(xs)]
-    groups = []
-    xs = list(sorted(xs))
-    current_group = [xs[0]]
-    last = xs[0]
 
-    for x in xs[1:]:
-        if x <= (last + tolerance):
-            current_group.append(x)
-        else:
-            groups.append(current_group)
-            current_group = [x]
-        last = x
+def extract_text(data, add_spaces: bool = True):
+    tokens = OcrTokens.from_details(data["result"][0]["details"])
+    if not len(tokens):
+        return ""
+    min_height, x_tolerance = tokens.char_stats()
+    lines = collate_lines(tokens, tokens.line_ids(min_height), x_tolerance, add_spaces)
+    min_spaces = min((len(line) - len(line.lstrip()) for line in lines if line.strip()), default=0)
+    text = "\n".join(line[min_spaces:] for line in lines)
+    return text
 
-    groups.append(current_group)
-    return groups
 
+def get_ocr_result(image_file: Source, languages: str = 'eng+tam+hin', config: str = ''):
+    try:
+        image_bytes = read_source(image_file)
+    except OSError:
+        print("Error: Image not found!")
+        return None
 
-def make_cluster_dict(values, tolerance):
-    clusters = cluster_list(list(set(values)), tolerance)
+    cache_key = make_ocr_key(image_bytes, languages, config)
+    cached = ocr_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("redact_cache_hits", cache="ocr")
+        return cached
+    metrics.inc("redact_cache_misses", cache="ocr")
 
-    nested_tuples = [
-        [(val, i) for val in value_cluster] for i, value_cluster in enumerate(clusters)
-    ]
-    return dict(itertools.chain(*nested_tuples))
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        print("Error: Image not found!")
+        return None
 
+    ocr_result = ocr_image(img, languages, config)
+    ocr_cache.put(cache_key, ocr_result)
+    return ocr_result
 
-def cluster_objects(xs: list[dict], tolerance: float):
-    key_fn = lambda x: (x["coordinates"][1] + x["coordinates"][3]) / 2
-    values = map(key_fn, xs)
-    cluster_dict = make_cluster_dict(values, tolerance)
-    get_0, get_1 = itemgetter(0), itemgetter(1)
-    cluster_tuples = sorted(((x, cluster_dict.get(key_fn(x))) for x in xs), key=get_1)
-    grouped = itertools.groupby(cluster_tuples, key=get_1)
-    return [list(map(get_0, v)) for k, v in grouped]
 
+def ocr_image(img: cv2.typing.MatLike, languages: str = 'eng+tam+hin', config: str = ''):
+    with metrics.span("osd"):
+        languages = select_languages(img, languages)
+    with metrics.span("ocr"):
+        if should_tile(img):
+            # Huge scans are recognised tile by tile across processes
+            tokens = ocr_tiled(img, recognize, languages, config)
+        else:
+            tokens = recognize(img, languages, config)
 
-def get_avg_char_width(data):
-    height = 1000
-    sum_widths = 0.0
-    cnt = 0
-    for datum in data:
-        height = min(height, abs(datum["coordinates"][3] - datum["coordinates"][1]))
-        sum_widths += datum["coordinates"][2] - datum["coordinates"][0]
-        cnt += len(datum["value"])
-    return height / 2, sum_widths // cnt
+    metrics.inc("redact_ocr_tokens", len(tokens))
+    return {'result': [{'details': tokens.to_details()}]}
 
 
-def collate_line(line_chars, tolerance, add_spaces) -> str:
-    coll = ""
-    last_x1 = 0
 
-    for char in sorted(line_chars, key=lambda x: x["coordinates"][0]):
-        x_min, y_min, x_max, y_max = char["coordinates"]
-        print(f"Word: '{char['value']}' - Coordinates: ({x_min}, {y_min}) to ({x_max}, {y_max})")
-        
-        coll += " "
-        while last_x1 + tolerance < char["coordinates"][0] and add_spaces:
-            coll += " "
-            last_x1 += tolerance
-        coll += char["value"]
-        last_x1 = char["coordinates"][2]
+def is_partial_match(value, text):
+    """
+    Function to check if the text contains the value as a partial match.
+    """
+    return value.lower() in text.lower()
 
-    return coll[1:] if add_spaces else coll.strip()
 
+def locate_in_ocr(ocr_result: dict, words: list[str], page_number: int = 0) -> dict[str, list[tuple]]:
+    """
+    OCR word boxes matching each of `words`, as (page, x0, y0, x1, y1)
+    tuples, for building a redaction plan.
+    """
+    tokens = OcrTokens.from_details(ocr_result["result"][0]["details"])
+    # One automaton and one pass over the tokens, hits grouped by target
+    matcher = SubstringMatcher(words)
+    hits: list[list[int]] = [[] for _ in matcher.targets]
+    for i, value in enumerate(tokens.text.tolist()):
+        for target in matcher.matching_targets(value):
+            hits[target].append(i)
+
+    target_index = {target: i for i, target in enumerate(matcher.targets)}
+    boxes = tokens.boxes.tolist()
+    locations = {}
+    for word in dict.fromkeys(words):
+        index = target_index.get(word.lower())
+        locations[word] = [] if index is None else [(page_number, *boxes[i]) for i in hits[index]]
+    return locations
+
+
+def burn_in_boxes(pic: cv2.typing.MatLike, boxes: np.ndarray, remove_picture: bool):
+    """
+    Black out OCR word `boxes` (x0, y0, x1, y1 rows) and, when asked, faces.
+    """
+    # Pad the boxes a little so ascenders and descenders are covered too
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4) + np.array([-5, -10, 5, 2], dtype=np.int32)
+    boxes = np.maximum(boxes, 0)
+    boxes[:, 2] = np.minimum(boxes[:, 2], pic.shape[1])
+    for x_min, y_min, x_max, y_max in boxes.tolist():
+        cv2.rectangle(pic, (x_min, y_min), (x_max, y_max), BLACK, -1)
+    metrics.inc("redact_matches", len(boxes), source="image")
 
-def extract_text(data, add_spaces: bool = True):
-    min_height, x_tolerance = get_avg_char_width(data["result"][0]["details"])
-    doctop_clusters = cluster_objects(
-        data["result"][0]["details"], tolerance=min_height
-    )
-    lines = (
-        collate_line(line_chars, x_tolerance, add_spaces)
-        for line_chars in doctop_clusters
-    )
-    lines = list(lines)
-    min_spaces = min(len(line) - len(line.lstrip()) for line in lines if line.strip())
-    text = "\n".join(line[min_spaces:] for line in lines)
-    return text
+    if remove_picture:
+        with metrics.span("face"):
+            faces = is_human_image(pic)
+        for human in faces:
+            x, y, w, h = human
+            cv2.rectangle(pic, (x, y), (x + w, y + h), BLACK, -1)
+        metrics.inc("redact_faces", len(faces))
 
 
-def get_ocr_result(image_file: str, languages: str = 'eng+tam+hin'):
-    img = cv2.imread(image_file)
-    if img is None:
-        print("Error: Image not found!")
-        return None
+def redact_image(pic: cv2.typing.MatLike, ocr_result: dict, words: list[str], remove_picture: bool):
+    with metrics.span("match"):
+        matcher = SubstringMatcher(words)
+        tokens = OcrTokens.from_details(ocr_result["result"][0]["details"])
+        hits = np.fromiter((matcher.contains(value) for value in tokens.text.tolist()), dtype=bool, count=len(tokens))
+    burn_in_boxes(pic, tokens.boxes[hits], remove_picture)
 
-    ocr_data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang=languages)
-    
-    result = []
-    for i in range(len(ocr_data['text'])):
-        if int(ocr_data['conf'][i]) > 0 and ocr_data['text'][i].strip() != '':
-            result.append({
-                'value': ocr_data['text'][i],
-                'coordinates': [
-                    int(ocr_data['left'][i]),
-                    int(ocr_data['top'][i]),
-                    int(ocr_data['left'][i] + ocr_data['width'][i]),
-                    int(ocr_data['top'][i] + ocr_data['height'][i]),
-                ]
-            })
 
-    return {'result': [{'details': result}]}
+def _decode(path: Source):
+    try:
+        image_bytes = read_source(path)
+    except OSError:
+        print("Error: Image not found!")
+        return None, None
 
+    pic = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if pic is None:
+        print("Error: Image not found!")
+        return None, None
+    return image_bytes, pic
 
 
-def is_partial_match(value, text):
-    """
-    Function to check if the text contains the value as a partial match.
-    """
-    return value.lower() in text.lower()
+def _save(pic: cv2.typing.MatLike, red_file_name: str | None):
+    with metrics.span("save"):
+        if red_file_name is None:
+            return cv2.imencode(".png", pic)[1].tobytes()
+        cv2.imwrite(red_file_name, pic)
+
+    return red_file_name
 
 
 def search_replace_in_image(
-    path: str, words: list[str], remove_picture: bool, red_file_name: str
+    path: Source, words: list[str], remove_picture: bool, red_file_name: str | None
 ):
-    pic = cv2.imread(path)
+    """
+    Redact `words` (and faces) from an image given as a path or bytes. Writes
+    `red_file_name` and returns it, or returns PNG bytes when it is None.
+    """
+    image_bytes, pic = _decode(path)
     if pic is None:
-        print("Error: Image not found!")
         return None
 
-    ocr_result = get_ocr_result(path)
+    ocr_result = get_ocr_result(image_bytes)
 
     if "result" not in ocr_result or "details" not in ocr_result["result"][0]:
         print("Error: Invalid OCR result format.")
         return None
 
-    for word in words:
-        for instance in ocr_result["result"][0]["details"]:
-            if is_partial_match(instance["value"], word): 
-                x_min, y_min, x_max, y_max = instance["coordinates"]
+    redact_image(pic, ocr_result, words, remove_picture)
+    return _save(pic, red_file_name)
 
-                y_min = max(0, y_min - 10)  
-                y_max = max(0, y_max + 2) 
-                
-                x_min = max(0, x_min - 5) 
-                x_max = min(pic.shape[1], x_max + 5) 
 
-                cv2.rectangle(pic, (x_min, y_min), (x_max, y_max), BLACK, -1)
-                print(f"Redacting '{word}' at ({x_min}, {y_min}) to ({x_max}, {y_max})")
-
-                instance['value'] = '[REDACTED]'
+def locate_in_image(path: Source, words: list[str]) -> dict[str, list[tuple]]:
+    ocr_result = get_ocr_result(path)
+    if ocr_result is None:
+        return {}
+    return locate_in_ocr(ocr_result, words)
 
-    if remove_picture:
-        for human in is_human_image(pic):
-            x, y, w, h = human
-            cv2.rectangle(pic, (x, y), (x + w, y + h), BLACK, -1)
-            print(f"Redacting face at ({x}, {y}) to ({x + w}, {y + h})")
 
-    cv2.imwrite(red_file_name, pic)
-    print(f"Redacted image saved as {red_file_name}")
+def burn_in_image(
+    path: Source, boxes: dict[int, list[tuple]], remove_picture: bool, red_file_name: str | None
+):
+    """
+    Redact precomputed OCR `boxes` ({0: [(x0, y0, x1, y1), ...]}) without
+    running OCR again.
+    """
+    image_bytes, pic = _decode(path)
+    if pic is None:
+        return None
 
-    print("Redacted OCR Text:")
-    for instance in ocr_result["result"][0]["details"]:
-        print(f"Word: '{instance['value']}' - Coordinates: {instance['coordinates']}")
-        
-    return red_file_name
+    burn_in_boxes(pic, boxes.get(0, []), remove_picture)
+    return _save(pic, red_file_name)
 
 
-def read_image(image_file: str):
+def read_image(image_file: Source):
     ocr_result = get_ocr_result(image_file)
     if not ocr_result.get("result"):
         print("Error: OCR result is empty.")
         return ""
     
-    text = extract_text(ocr_result)
-    print("Extracted Text:", text)
-    return text
+    return extract_text(ocr_result)
@@ -1,48 +1,320 @@
-import os
+import hashlib
+import re
+import string
+import threading
+from collections import OrderedDict
 
-import cv2
 import fitz
-import numpy as np
-from PyPDF2 import PdfReader
 
-from core.misc import BLACK, is_human_image
+from core import metrics
+from core.face_detection import FaceMemo
+from core.file_io import Source, output_path, read_source
+from core.misc import BLACK
+
+_PUNCTUATION = string.punctuation + "“”‘’«»"
+_SEGMENT = re.compile(f"[^{re.escape(_PUNCTUATION)}]+")
+# Words with more segments than this (URLs, long codes) index only their
+# prefixes and suffixes, not every run in between.
+_MAX_SEGMENTS = 16
+
+
+def normalize_token(token: str) -> str:
+    return token.strip(_PUNCTUATION).lower()
+
+
+def _edges(token: str) -> tuple[str, str]:
+    """Leading and trailing punctuation of `token`."""
+    core_start = len(token) - len(token.lstrip(_PUNCTUATION))
+    core_end = len(token.rstrip(_PUNCTUATION))
+    return token[:core_start], token[max(core_start, core_end):]
+
+
+def _token_matches(word: str, part: str, key: str) -> bool:
+    """
+    Whether page word `word` is the lowered target part `part` (normalized to
+    `key`). Punctuation written in the target must be on the word too, so
+    "smith," matches "Smith," and "Smith,)" but not "Smith.".
+    """
+    word = word.lower()
+    if not key:
+        return word == part
+    if normalize_token(word) != key:
+        return False
+    lead, trail = _edges(part)
+    word_lead, word_trail = _edges(word)
+    return word_lead.endswith(lead) and word_trail.startswith(trail)
+
+
+def _pieces(token: str) -> set[str]:
+    """
+    Lowered runs of the punctuation-separated segments of `token` other than
+    the whole token, so "DOB:12/05/1990" gives "dob", "12/05/1990", "05",
+    "dob:12" and so on.
+    """
+    segments = [match.span() for match in _SEGMENT.finditer(token)]
+    n = len(segments)
+    if n < 2:
+        return set()
+    if n <= _MAX_SEGMENTS:
+        runs = [(a, b) for a in range(n) for b in range(a, n)]
+    else:
+        runs = [(0, b) for b in range(n)] + [(a, n - 1) for a in range(1, n)]
+    pieces = {token[segments[a][0]:segments[b][1]].lower() for a, b in runs}
+    pieces.discard(normalize_token(token))
+    return pieces
+
+
+class PageIndex:
+    """
+    Words of one page with their rectangles, plus hash maps from normalized
+    token to the positions of that token in `words`, and from each piece of a
+    word joined by punctuation ("12/05/1990" in "DOB:12/05/1990") to the
+    positions of the words it is part of.
+    """
+
+    def __init__(self, words: list[tuple]):
+        self.words = words
+        self.tokens: dict[str, list[int]] = {}
+        self.pieces: dict[str, list[int]] = {}
+        for i, word in enumerate(words):
+            token = normalize_token(word[4])
+            if token:
+                self.tokens.setdefault(token, []).append(i)
+            for piece in _pieces(word[4]):
+                self.pieces.setdefault(piece, []).append(i)
+        self.text = self._collate()
+
+    def _collate(self) -> str:
+        lines = []
+        current_line = None
+        current_words = []
+        for word in self.words:
+            line_key = (word[5], word[6])
+            if line_key != current_line and current_words:
+                lines.append(" ".join(current_words))
+                current_words = []
+            current_line = line_key
+            current_words.append(word[4])
+        if current_words:
+            lines.append(" ".join(current_words))
+        return "\n".join(lines)
+
+    def _run_rects(self, start: int, end: int) -> list[fitz.Rect]:
+        rects = []
+        last_line = None
+        for word in self.words[start:end]:
+            line_key = (word[5], word[6])
+            if line_key == last_line:
+                rects[-1] |= fitz.Rect(word[:4])
+            else:
+                rects.append(fitz.Rect(word[:4]))
+            last_line = line_key
+        return rects
+
+    def find(self, text: str) -> list[fitz.Rect] | None:
+        """
+        Rectangles of every occurrence of `text` as a run of whole tokens,
+        found through the token index. Returns None when `text` starts with
+        a token that is only punctuation, so the caller can fall back to a
+        full-page search.
+        """
+        parts = text.lower().split()
+        if not parts:
+            return []
+        keys = [normalize_token(part) for part in parts]
+        if not keys[0]:
+            return None
+
+        rects = []
+        for start in self.tokens.get(keys[0], ()):
+            end = start + len(parts)
+            if end > len(self.words):
+                continue
+            if all(_token_matches(self.words[start + k][4], parts[k], keys[k]) for k in range(len(parts))):
+                rects.extend(self._run_rects(start, end))
+        return rects
+
+    def find_joined(self, text: str) -> list[fitz.Rect]:
+        """
+        Areas where `text` may occur joined to other characters by
+        punctuation, as in "DOB:12/05/1990" or "(Kumar's)": its first token
+        is a piece of a page word, or it is a run whose last token is. The
+        caller searches each area for the exact text.
+        """
+        parts = text.lower().split()
+        keys = [normalize_token(part) for part in parts]
+        if not keys or not keys[0]:
+            return []
+
+        starts = [(start, True) for start in self.pieces.get(keys[0], ())]
+        if len(parts) > 1:
+            starts += [(start, False) for start in self.tokens.get(keys[0], ())]
+        areas = []
+        for start, joined_start in starts:
+            end = start + len(parts)
+            if end > len(self.words):
+                continue
+            run = [normalize_token(word[4]) for word in self.words[start:end]]
+            if any(token != key for token, key in zip(run[1:-1], keys[1:-1])):
+                continue
+            if len(parts) > 1 and not run[-1].startswith(keys[-1]):
+                continue
+            if not joined_start and run[-1] == keys[-1]:
+                continue  # a run of whole tokens, which find() covers
+            area = fitz.Rect(self.words[start][:4])
+            for word in self.words[start + 1:end]:
+                area |= fitz.Rect(word[:4])
+            areas.append(area)
+        return areas
+
+
+class PdfIndex:
+    def __init__(self, doc: fitz.Document):
+        self.pages = [PageIndex(page.get_text("words", sort=True)) for page in doc.pages()]
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(page.text for page in self.pages)
+
+
+_index_cache: OrderedDict[str, PdfIndex] = OrderedDict()
+_index_lock = threading.Lock()
+_INDEX_CACHE_SIZE = 16
+
+
+def _load(source: Source) -> tuple[bytes, str]:
+    pdf_bytes = read_source(source)
+    return pdf_bytes, hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def get_pdf_index(doc: fitz.Document, digest: str) -> PdfIndex:
+    with _index_lock:
+        index = _index_cache.get(digest)
+        if index is not None:
+            _index_cache.move_to_end(digest)
+            metrics.inc("redact_cache_hits", cache="pdf_index")
+            return index
+
+    metrics.inc("redact_cache_misses", cache="pdf_index")
+    with metrics.span("parse"):
+        index = PdfIndex(doc)
+    with _index_lock:
+        _index_cache[digest] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def _find_rects(page: fitz.Page, page_index: PageIndex, text: str) -> list[fitz.Rect]:
+    instances = page_index.find(text)
+    if instances is None:
+        metrics.inc("redact_search_fallbacks")
+        return page.search_for(text)
+    for area in page_index.find_joined(text):
+        instances.extend(page.search_for(text, clip=area))
+    return instances
+
+
+def locate_in_pdf(path: Source, words: list[str]) -> dict[str, list[tuple]]:
+    """
+    Every occurrence of each word as (page, x0, y0, x1, y1) tuples, for
+    building a redaction plan.
+    """
+    pdf_bytes, digest = _load(path)
+    targets = list(dict.fromkeys(word for word in words if word.strip()))
+    locations = {word: [] for word in targets}
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        index = get_pdf_index(doc, digest)
+        with metrics.span("match"):
+            for page_number, (page, page_index) in enumerate(zip(doc.pages(), index.pages)):
+                for text in targets:
+                    locations[text].extend(
+                        (page_number, *tuple(rect)) for rect in _find_rects(page, page_index, text)
+                    )
+    return locations
+
+
+def _redact_faces(page: fitz.Page, face_memo: FaceMemo) -> bool:
+    was_redacted = False
+    with metrics.span("face"):
+        for img in page.get_images(full=True):
+            xref = img[0]  # Extract the image reference number
+            if face_memo.has_face(xref):
+                metrics.inc("redact_faces")
+                for rect in page.get_image_rects(xref):
+                    page.add_redact_annot(fitz.Rect(rect), fill=BLACK)
+                    was_redacted = True
+    return was_redacted
+
+
+def _save(doc: fitz.Document, path: Source, red_file_name: str | None):
+    with metrics.span("save"):
+        if red_file_name is None:
+            return doc.tobytes(garbage=1)
+        redacted_pdf_path = output_path(path, red_file_name)
+        doc.save(redacted_pdf_path)
+    return redacted_pdf_path
 
 
 def search_replace_in_pdf(
-    path: str, words: list[str], remove_picture: bool, red_file_name: str
+    path: Source, words: list[str], remove_picture: bool, red_file_name: str | None
 ):
-    with fitz.open(path) as doc:
-        for page in doc.pages():
+    """
+    Redact `words` (and faces) from a PDF given as a path or bytes. Writes
+    `red_file_name` and returns its path, or returns the PDF bytes when
+    `red_file_name` is None.
+    """
+    pdf_bytes, digest = _load(path)
+    targets = list(dict.fromkeys(word for word in words if word.strip()))
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        index = get_pdf_index(doc, digest)
+        face_memo = FaceMemo(doc)
+        for page, page_index in zip(doc.pages(), index.pages):
             was_redacted = False
-            for text in words:
-                instances = page.search_for(text)
-                for inst in instances:
-                    page.add_redact_annot(inst, fill=BLACK)
-                    was_redacted = True
-            if remove_picture:
-                for img in page.get_images(full=True):
-                    xref = img[0]  # Extract the image reference number
-                    base_image = doc.extract_image(xref)
-                    img_bytes = base_image["image"]
-                    img_array = np.frombuffer(img_bytes, dtype=np.uint8)
-                    img_cv = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-
-                    # Check if the image is a human image (example check)
-                    if len(is_human_image(img_cv)) > 0:
-                        print(f"Found a human image at {xref}")
-                        rect = page.get_image_rects(xref)[0]
-                        rect_ = fitz.Rect(rect[0], rect[1], rect[2], rect[3])
-                        page.add_redact_annot(rect_, fill=BLACK)
+            with metrics.span("match"):
+                for text in targets:
+                    instances = _find_rects(page, page_index, text)
+                    for inst in instances:
+                        page.add_redact_annot(inst, fill=BLACK)
                         was_redacted = True
+                    metrics.inc("redact_matches", len(instances), source="pdf")
+            if remove_picture:
+                was_redacted |= _redact_faces(page, face_memo)
             if was_redacted:
-                page.apply_redactions()
+                with metrics.span("apply"):
+                    page.apply_redactions()
 
-        redacted_pdf_path = os.path.join(os.path.dirname(path), red_file_name)
-        doc.save(redacted_pdf_path)
-    return redacted_pdf_path
+        return _save(doc, path, red_file_name)
+
+
+def burn_in_pdf(
+    path: Source, boxes: dict[int, list[tuple]], remove_picture: bool, red_file_name: str | None
+):
+    """
+    Redact precomputed `boxes` ({page: [(x0, y0, x1, y1), ...]}) and, when
+    asked, faces, without searching the text again.
+    """
+    pdf_bytes = read_source(path)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        face_memo = FaceMemo(doc)
+        for page_number, page in enumerate(doc.pages()):
+            page_boxes = boxes.get(page_number, ())
+            for box in page_boxes:
+                page.add_redact_annot(fitz.Rect(box), fill=BLACK)
+            metrics.inc("redact_matches", len(page_boxes), source="pdf")
+            was_redacted = bool(page_boxes)
+            if remove_picture:
+                was_redacted |= _redact_faces(page, face_memo)
+            if was_redacted:
+                with metrics.span("apply"):
+                    page.apply_redactions()
+
+        return _save(doc, path, red_file_name)
 
 
-def read_pdf(pdf_file: str):
-    pdf_reader = PdfReader(pdf_file)
-    text = "\n\n".join(page.extract_text() for page in pdf_reader.pages)
-    return text
\ No newline at end of file
+def read_pdf(pdf_file: Source):
+    pdf_bytes, digest = _load(pdf_file)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return get_pdf_index(doc, digest).text
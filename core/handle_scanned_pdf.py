@@ -0,0 +1,197 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import fitz
+import numpy as np
+
+from core import metrics
+from core.file_io import Source, output_path, read_source
+from core.handle_images import burn_in_boxes, extract_text, locate_in_ocr, ocr_image, redact_image
+from core.ocr_cache import ocr_cache
+
+SCAN_DPI = int(os.environ.get("REDACT_SCAN_DPI", "200"))
+SCAN_WORKERS = int(os.environ.get("REDACT_SCAN_WORKERS", str(os.cpu_count() or 1)))
+OCR_LANGUAGES = "eng+tam+hin"
+
+
+def _render_page(doc: fitz.Document, page_number: int, dpi: int) -> np.ndarray:
+    pix = doc[page_number].get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+# Each pool worker opens the document once from the bytes handed to its
+# initializer; jobs then only carry page numbers.
+_worker_doc: fitz.Document | None = None
+
+
+def _open_worker_doc(pdf_bytes: bytes):
+    global _worker_doc
+    _worker_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _ocr_page(page_number: int, dpi: int, languages: str):
+    img = _render_page(_worker_doc, page_number, dpi)
+    return ocr_image(img, languages)
+
+
+def _encode_page(img: np.ndarray, page_number: int) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise ValueError(f"Failed to encode page {page_number + 1}")
+    return encoded.tobytes()
+
+
+def _redact_page(page_number: int, dpi: int, languages: str, ocr_result, words, remove_picture):
+    img = _render_page(_worker_doc, page_number, dpi)
+    if ocr_result is None:
+        ocr_result = ocr_image(img, languages)
+    redact_image(img, ocr_result, words, remove_picture)
+    return _encode_page(img, page_number)
+
+
+def _burn_in_page(page_number: int, dpi: int, boxes, remove_picture):
+    img = _render_page(_worker_doc, page_number, dpi)
+    burn_in_boxes(img, boxes, remove_picture)
+    return _encode_page(img, page_number)
+
+
+def _page_key(digest: str, page_number: int, dpi: int, languages: str) -> str:
+    return f"scan-{digest}-{page_number}-{dpi}-{languages}"
+
+
+def _merged(future):
+    result, recorded = future.result()
+    metrics.merge(recorded)
+    return result
+
+
+def _run_in_order(fn, jobs, workers: int, pdf_bytes: bytes):
+    """
+    Yield fn(*job) results in job order, keeping at most 2 * workers pages
+    rendered or in flight at any time.
+    """
+    max_in_flight = max(1, workers * 2)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker_doc, initargs=(pdf_bytes,)) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(metrics.collect, fn, *job))
+            if len(pending) >= max_in_flight:
+                yield _merged(pending.popleft())
+        while pending:
+            yield _merged(pending.popleft())
+
+
+def _page_ocr_results(pdf_bytes: bytes, dpi: int, languages: str, workers: int) -> list[dict]:
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_count = doc.page_count
+
+    # Every page must still be cached when the document is redacted
+    ocr_cache.reserve(page_count)
+    keys = [_page_key(digest, i, dpi, languages) for i in range(page_count)]
+    results = {i: ocr_cache.get(key) for i, key in enumerate(keys)}
+    missing = [i for i, result in results.items() if result is None]
+    metrics.inc("redact_cache_hits", page_count - len(missing), cache="ocr")
+    metrics.inc("redact_cache_misses", len(missing), cache="ocr")
+
+    # Each page's "ocr" span comes back from its worker with the result
+    jobs = ((i, dpi, languages) for i in missing)
+    for i, ocr_result in zip(missing, _run_in_order(_ocr_page, jobs, workers, pdf_bytes)):
+        ocr_cache.put(keys[i], ocr_result)
+        results[i] = ocr_result
+    return [results[i] for i in range(page_count)]
+
+
+def read_scanned_pdf(path: Source, dpi: int = SCAN_DPI, languages: str = OCR_LANGUAGES, workers: int = SCAN_WORKERS):
+    pages = []
+    for ocr_result in _page_ocr_results(read_source(path), dpi, languages, workers):
+        if ocr_result["result"][0]["details"]:
+            pages.append(extract_text(ocr_result))
+        else:
+            pages.append("")
+    return "\n\n".join(pages)
+
+
+def _assemble(path: Source, page_rects: list[fitz.Rect], jpeg_pages, red_file_name: str | None):
+    with fitz.open() as out:
+        for rect, jpeg_bytes in zip(page_rects, jpeg_pages):
+            page = out.new_page(width=rect.width, height=rect.height)
+            page.insert_image(page.rect, stream=jpeg_bytes)
+            metrics.inc("redact_scanned_pages")
+
+        with metrics.span("save"):
+            if red_file_name is None:
+                return out.tobytes(garbage=3, deflate=True)
+            redacted_pdf_path = output_path(path, red_file_name)
+            out.save(redacted_pdf_path, garbage=3, deflate=True)
+    return redacted_pdf_path
+
+
+def search_replace_in_scanned_pdf(
+    path: Source,
+    words: list[str],
+    remove_picture: bool,
+    red_file_name: str | None,
+    dpi: int = SCAN_DPI,
+    languages: str = OCR_LANGUAGES,
+    workers: int = SCAN_WORKERS,
+):
+    """
+    Rasterise, OCR and redact every page of a scanned PDF given as a path or
+    bytes. Writes `red_file_name` and returns its path, or returns the PDF
+    bytes when `red_file_name` is None.
+    """
+    pdf_bytes = read_source(path)
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_rects = [page.rect for page in doc.pages()]
+
+    keys = [_page_key(digest, i, dpi, languages) for i in range(len(page_rects))]
+    jobs = (
+        (i, dpi, languages, ocr_cache.get(keys[i]), words, remove_picture)
+        for i in range(len(page_rects))
+    )
+    return _assemble(path, page_rects, _run_in_order(_redact_page, jobs, workers, pdf_bytes), red_file_name)
+
+
+def locate_in_scanned_pdf(
+    path: Source,
+    words: list[str],
+    dpi: int = SCAN_DPI,
+    languages: str = OCR_LANGUAGES,
+    workers: int = SCAN_WORKERS,
+) -> dict[str, list[tuple]]:
+    """
+    OCR word boxes (pixels at `dpi`) matching each of `words`, as
+    (page, x0, y0, x1, y1) tuples, for building a redaction plan.
+    """
+    locations = {word: [] for word in dict.fromkeys(words)}
+    for page_number, ocr_result in enumerate(_page_ocr_results(read_source(path), dpi, languages, workers)):
+        for word, boxes in locate_in_ocr(ocr_result, words, page_number).items():
+            locations[word].extend(boxes)
+    return locations
+
+
+def burn_in_scanned_pdf(
+    path: Source,
+    boxes: dict[int, list[tuple]],
+    remove_picture: bool,
+    red_file_name: str | None,
+    dpi: int = SCAN_DPI,
+    workers: int = SCAN_WORKERS,
+):
+    """
+    Rasterise every page and black out precomputed OCR `boxes`
+    ({page: [(x0, y0, x1, y1), ...]} in pixels at `dpi`) without running OCR
+    again.
+    """
+    pdf_bytes = read_source(path)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_rects = [page.rect for page in doc.pages()]
+
+    jobs = ((i, dpi, boxes.get(i, []), remove_picture) for i in range(len(page_rects)))
+    return _assemble(path, page_rects, _run_in_order(_burn_in_page, jobs, workers, pdf_bytes), red_file_name)
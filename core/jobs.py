@@ -0,0 +1,341 @@
+"""
+Durable job queue behind the HTTP API (api.py) and its workers (worker.py).
+
+Jobs live in a SQLite database under REDACT_JOBS_DIR, each with a directory
+for its upload and output, so any number of API instances and worker
+processes on the machine share one queue. A worker claims the oldest queued
+job and holds it under a lease it keeps renewing; if the worker dies, the
+job goes back to the queue once the lease runs out.
+
+Two kinds of job:
+
+- extract: OCR/parse the file and find identifiers; the result lists them.
+- redact: black out the identifiers of the selected types. With `source`
+  set to a finished extract job, its file and identifiers are reused;
+  otherwise the job extracts them itself.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from core import read_image, read_pdf, read_scanned_pdf
+from core.entities import extract_entities, raise_error
+from core.handle_scanned_pdf import SCAN_WORKERS
+from core.llm_scheduler import llm_scheduler
+from core.redaction import search_replace
+
+JOBS_DIR = os.environ.get("REDACT_JOBS_DIR", "jobs")
+LEASE_SECONDS = float(os.environ.get("REDACT_JOB_LEASE", "60"))
+# Finished jobs and their files are removed after this many seconds
+JOB_TTL = float(os.environ.get("REDACT_JOB_TTL", str(24 * 3600)))
+# A job whose worker was lost this many times is failed instead of retried
+MAX_ATTEMPTS = 3
+# Partial extraction results are written at most this often
+PROGRESS_INTERVAL = 0.5
+
+FILE_TYPES = {"pdf", "scanned_pdf", "image"}
+FINISHED = {"done", "failed"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+class JobStore:
+    def __init__(self, root: str = JOBS_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.join(self.root, "jobs.db")
+        # SQLite connections cannot be shared between threads
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for key in ("params", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def submit(
+        self,
+        kind: str,
+        file_name: str,
+        file_type: str,
+        params: dict,
+        file_bytes: bytes | None = None,
+        input_path: str | None = None,
+    ) -> str:
+        """
+        Queue a job on `file_bytes` (written to the job's directory) or on an
+        `input_path` already in the store.
+        """
+        job_id = uuid.uuid4().hex
+        if file_bytes is not None:
+            os.makedirs(self.job_dir(job_id))
+            input_path = os.path.join(self.job_dir(job_id), os.path.basename(file_name))
+            with open(input_path, "wb") as f:
+                f.write(file_bytes)
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, file_name, file_type, input_path, params, created, updated) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, file_name, file_type, input_path, json.dumps(params), now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def counts(self) -> dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def claim(self, worker_id: str) -> dict | None:
+        """Take the oldest queued job, or one whose worker's lease ran out."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["status"] == "running" and row["attempts"] >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                        (f"Worker lost {row['attempts']} times", now, row["id"]),
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, claimed_by = ?, "
+                    "lease_until = ?, updated = ? WHERE id = ?",
+                    (worker_id, now + LEASE_SECONDS, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+                return self.get(row["id"])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _update(self, job_id: str, worker_id: str, assignments: str, values: tuple) -> bool:
+        # Only the worker holding the claim may touch a running job
+        now = time.time()
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ? AND claimed_by = ? AND status = 'running'",
+            (*values, now, job_id, worker_id),
+        )
+        return cursor.rowcount > 0
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        return self._update(job_id, worker_id, "lease_until = ?", (time.time() + LEASE_SECONDS,))
+
+    def set_progress(self, job_id: str, worker_id: str, progress: dict) -> bool:
+        return self._update(
+            job_id, worker_id, "progress = ?, lease_until = ?", (json.dumps(progress), time.time() + LEASE_SECONDS)
+        )
+
+    def finish(self, job_id: str, worker_id: str, result: dict) -> bool:
+        return self._update(job_id, worker_id, "status = 'done', result = ?", (json.dumps(result),))
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._update(job_id, worker_id, "status = 'failed', error = ?", (error,))
+
+    def output_path(self, job: dict) -> str | None:
+        if job["status"] != "done" or not (job["result"] or {}).get("output"):
+            return None
+        return os.path.join(self.job_dir(job["id"]), job["result"]["output"])
+
+    def purge(self, older_than: float = JOB_TTL) -> int:
+        """
+        Remove finished jobs last updated more than `older_than` seconds ago,
+        except those a live job still depends on: a redact job reads its
+        source's entities and the input file in the source's directory.
+        """
+        cutoff = time.time() - older_than
+        conn = self._conn()
+        in_use = set()
+        for row in conn.execute(
+            "SELECT id, input_path, params FROM jobs WHERE status NOT IN ('done', 'failed') OR updated >= ?", (cutoff,)
+        ).fetchall():
+            in_use.add(os.path.basename(os.path.dirname(row["input_path"])))
+            in_use.add((json.loads(row["params"]) or {}).get("source"))
+        ids = [
+            row["id"]
+            for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,)
+            ).fetchall()
+            if row["id"] not in in_use
+        ]
+        for job_id in ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(ids)
+
+
+def read_text(file_bytes: bytes, file_type: str, workers: int = SCAN_WORKERS) -> str:
+    match file_type:
+        case "pdf":
+            return read_pdf(file_bytes)
+        case "scanned_pdf":
+            return read_scanned_pdf(file_bytes, workers=workers)
+        case "image":
+            return read_image(file_bytes)
+        case _:
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def _extract(store: JobStore, job: dict, worker_id: str, file_bytes: bytes, page_workers: int) -> list[dict]:
+    store.set_progress(job["id"], worker_id, {"stage": "reading"})
+    text = read_text(file_bytes, job["file_type"], page_workers)
+
+    found = []
+    last_update = 0.0
+
+    def on_entities(identifiers):
+        nonlocal last_update
+        found.extend({"objValue": obj.objValue, "objType": obj.objType.value} for obj in identifiers)
+        if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+            store.set_progress(job["id"], worker_id, {"stage": "extracting", "entities": found})
+            last_update = time.monotonic()
+
+    store.set_progress(job["id"], worker_id, {"stage": "extracting", "entities": []})
+    # A failed chunk fails the job, so a partial extraction never reads as done
+    identifiers = extract_entities(text, on_error=raise_error, on_entities=on_entities)
+    return [{"objValue": obj.objValue, "objType": obj.objType.value} for obj in identifiers]
+
+
+def run_job(store: JobStore, job: dict, worker_id: str, page_workers: int = SCAN_WORKERS) -> dict:
+    with open(job["input_path"], "rb") as f:
+        file_bytes = f.read()
+
+    if job["kind"] == "extract":
+        return {"entities": _extract(store, job, worker_id, file_bytes, page_workers)}
+
+    if job["kind"] == "redact":
+        params = job["params"]
+        source_id = params.get("source")
+        if source_id:
+            source = store.get(source_id)
+            if source is None or source["status"] != "done":
+                raise ValueError(f"Source job {source_id} has not finished")
+            entities = source["result"]["entities"]
+        else:
+            entities = _extract(store, job, worker_id, file_bytes, page_workers)
+
+        types = set(params.get("types") or [])
+        words = [entity["objValue"] for entity in entities if entity["objType"] in types]
+        store.set_progress(job["id"], worker_id, {"stage": "redacting"})
+        os.makedirs(store.job_dir(job["id"]), exist_ok=True)
+        path = search_replace(
+            file_bytes,
+            words,
+            job["file_name"],
+            bool(params.get("remove_picture")),
+            job["file_type"],
+            output_dir=store.job_dir(job["id"]),
+            workers=page_workers,
+        )
+        return {"output": os.path.basename(path), "redacted": len(words)}
+
+    raise ValueError(f"Unknown job kind: {job['kind']}")
+
+
+def _keep_lease(store: JobStore, job_id: str, worker_id: str, stop: threading.Event):
+    # OCR of a long scan can run for minutes without reporting progress
+    while not stop.wait(LEASE_SECONDS / 3):
+        store.renew(job_id, worker_id)
+
+
+def work(
+    store: JobStore,
+    poll_interval: float = 1.0,
+    stop: threading.Event | None = None,
+    page_workers: int = SCAN_WORKERS,
+):
+    """Claim and run jobs until `stop` is set; `page_workers` sizes scanned-PDF page pools."""
+    stop = stop or threading.Event()
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    last_purge = 0.0
+    while not stop.is_set():
+        job = store.claim(worker_id)
+        if job is None:
+            if time.monotonic() - last_purge > 600:
+                store.purge()
+                last_purge = time.monotonic()
+            stop.wait(poll_interval)
+            continue
+
+        logging.info(f"Running {job['kind']} job {job['id']} ({job['file_name']})")
+        renewing = threading.Event()
+        threading.Thread(target=_keep_lease, args=(store, job["id"], worker_id, renewing), daemon=True).start()
+        try:
+            store.finish(job["id"], worker_id, run_job(store, job, worker_id, page_workers))
+        except Exception as e:
+            logging.error(f"Job {job['id']} failed: {e}")
+            store.fail(job["id"], worker_id, str(e))
+        finally:
+            renewing.set()
+
+
+def _worker_main(root: str, workers: int):
+    logging.basicConfig(level=logging.INFO)
+    # Each worker process has its own LLM scheduler; split the quota between them
+    llm_scheduler.configure(llm_scheduler.rpm / workers, llm_scheduler.tpm / workers)
+    # and the CPUs, so the page pools of parallel scanned PDFs don't oversubscribe
+    work(JobStore(root), page_workers=max(1, SCAN_WORKERS // workers))
+
+
+def start_workers(count: int, root: str = JOBS_DIR) -> list[multiprocessing.Process]:
+    """
+    Start `count` worker processes on the store at `root`. They are not
+    daemonic, so they can run the scanned-PDF page pools themselves.
+    """
+    processes = []
+    for _ in range(count):
+        process = multiprocessing.Process(target=_worker_main, args=(root, count))
+        process.start()
+        processes.append(process)
+    return processes
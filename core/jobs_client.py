@@ -0,0 +1,129 @@
+"""
+Client for the job API in api.py, used by the Streamlit app when
+REDACT_API_URL is set so the heavy work runs on the API's workers.
+"""
+import json
+import logging
+import os
+import time
+
+import httpx
+
+API_URL = os.environ.get("REDACT_API_URL", "")
+POLL_SECONDS = 0.5
+
+
+class JobFailed(Exception):
+    pass
+
+
+def _query_value(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return ",".join(value)
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+
+class JobClient:
+    def __init__(self, base_url: str = API_URL, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.Client(base_url=self.base_url, timeout=httpx.Timeout(timeout, connect=10.0))
+
+    def _check(self, resp: httpx.Response) -> httpx.Response:
+        if resp.is_error:
+            try:
+                message = resp.json().get("error", resp.text)
+            except ValueError:
+                message = resp.text
+            raise JobFailed(f"HTTP {resp.status_code}: {message}")
+        return resp
+
+    def submit(self, kind: str, file_bytes: bytes | None = None, **params) -> str:
+        """Queue a job; `params` become query parameters (lists are comma joined)."""
+        query = {key: _query_value(value) for key, value in params.items() if value is not None}
+        resp = self._client.post("/jobs", params={"kind": kind, **query}, content=file_bytes or b"")
+        return self._check(resp).json()["id"]
+
+    def get(self, job_id: str) -> dict:
+        return self._check(self._client.get(f"/jobs/{job_id}")).json()
+
+    def events(self, job_id: str):
+        """Yield the job every time it changes, until it finishes."""
+        with self._client.stream("GET", f"/jobs/{job_id}/events", timeout=httpx.Timeout(None, connect=10.0)) as resp:
+            self._check(resp)
+            for line in resp.iter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[len("data:"):])
+
+    def wait(self, job_id: str, on_progress=None) -> dict:
+        """Follow the job until it finishes; raises JobFailed if it failed."""
+        for job in self.events(job_id):
+            if on_progress is not None and job.get("progress"):
+                on_progress(job["progress"])
+            if job["status"] == "failed":
+                raise JobFailed(job["error"])
+            if job["status"] == "done":
+                return job
+        raise JobFailed(f"Lost track of job {job_id}")
+
+    def download(self, job_id: str, output_dir: str) -> str:
+        with self._client.stream("GET", f"/jobs/{job_id}/result") as resp:
+            self._check(resp)
+            disposition = resp.headers.get("content-disposition", "")
+            file_name = disposition.split("filename=")[-1].strip('"') or job_id
+            path = os.path.join(output_dir, os.path.basename(file_name))
+            with open(path, "wb") as f:
+                for block in resp.iter_bytes():
+                    f.write(block)
+        return path
+
+    def redact_many(self, jobs: list[dict], output_dir: str, on_done=None) -> list[tuple[str | None, Exception | None]]:
+        """
+        Like `core.redaction.redact_many` but on the API's workers. Each job
+        has `source` (an extract job ID) or `file_bytes`, `file_name` and
+        `file_type`, plus `types` and `remove_picture`.
+
+        Everything is queued up front so the workers run the files in
+        parallel; `on_done(index, path, error)` fires as each one finishes.
+        """
+        results: list[tuple[str | None, Exception | None]] = [(None, None)] * len(jobs)
+        pending = {}
+        for i, job in enumerate(jobs):
+            try:
+                if job.get("source"):
+                    pending[i] = self.submit(
+                        "redact", source=job["source"], types=job["types"], remove_face=job["remove_picture"]
+                    )
+                else:
+                    pending[i] = self.submit(
+                        "redact",
+                        job["file_bytes"],
+                        file_name=job["file_name"],
+                        file_type=job["file_type"],
+                        types=job["types"],
+                        remove_face=job["remove_picture"],
+                    )
+            except (JobFailed, httpx.HTTPError) as e:
+                results[i] = (None, e)
+                if on_done is not None:
+                    on_done(i, *results[i])
+
+        while pending:
+            for i, job_id in list(pending.items()):
+                try:
+                    job = self.get(job_id)
+                    if job["status"] == "failed":
+                        raise JobFailed(job["error"])
+                    if job["status"] != "done":
+                        continue
+                    results[i] = (self.download(job_id, output_dir), None)
+                except (JobFailed, httpx.HTTPError) as e:
+                    logging.error(f"Failed to redact {jobs[i].get('file_name', job_id)}: {e}")
+                    results[i] = (None, e)
+                del pending[i]
+                if on_done is not None:
+                    on_done(i, *results[i])
+            if pending:
+                time.sleep(POLL_SECONDS)
+        return results
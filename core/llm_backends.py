@@ -0,0 +1,330 @@
+"""
+Chat-completion backends for entity extraction.
+
+All HTTP backends share one pooled `httpx.Client`, so connections stay alive
+across chunks, files and reruns. Each backend caps its own in-flight requests
+with a semaphore and retries rate limits, server errors and dropped
+connections with exponential backoff.
+
+Pick one with REDACT_LLM_BACKEND (groq, openai or ollama) and, optionally,
+REDACT_LLM_MODEL, REDACT_LLM_BASE_URL, REDACT_LLM_API_KEY and
+REDACT_LLM_BACKEND_CONCURRENCY.
+"""
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+LLM_BACKEND = os.environ.get("REDACT_LLM_BACKEND", "groq")
+LLM_TIMEOUT = float(os.environ.get("REDACT_LLM_TIMEOUT", "120"))
+# Retries after the first attempt
+LLM_RETRIES = int(os.environ.get("REDACT_LLM_RETRIES", "4"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("REDACT_HTTP_MAX_CONNECTIONS", "32"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_http_client: httpx.Client | None = None
+_http_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=60.0,
+                ),
+            )
+    return _http_client
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+
+def _log_retry(retry_state):
+    exc = retry_state.outcome.exception()
+    reason = f"HTTP {exc.response.status_code}" if isinstance(exc, httpx.HTTPStatusError) else type(exc).__name__
+    logging.warning(
+        f"LLM request failed ({reason}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s (retry {retry_state.attempt_number}/{LLM_RETRIES})"
+    )
+
+
+_backoff = wait_random_exponential(multiplier=0.5, max=30)
+
+
+def _wait(retry_state) -> float:
+    # Honour the server's Retry-After on 429/503 before falling back to backoff
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        try:
+            return min(float(exc.response.headers.get("retry-after", "")), 60.0)
+        except ValueError:
+            pass
+    return _backoff(retry_state)
+
+
+_with_retries = retry(
+    retry=retry_if_exception(_is_retryable),
+    stop=stop_after_attempt(LLM_RETRIES + 1),
+    wait=_wait,
+    before_sleep=_log_retry,
+    reraise=True,
+)
+
+
+@dataclass
+class Completion:
+    content: str
+    id: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+
+
+class LLMBackend:
+    """
+    A model behind a chat API. `complete` returns the whole answer; `stream`
+    yields it in pieces as they arrive and, if the server reports token usage,
+    calls `on_usage(prompt_tokens, completion_tokens)` once it is known.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, max_concurrency: int = 4):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def cache_id(self) -> str:
+        return self.model
+
+    def complete(self, system: str, user: str) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, system: str, user: str, on_usage=None) -> Iterator[str]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _messages(system: str, user: str) -> list[dict]:
+        return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any server speaking the OpenAI /chat/completions protocol (OpenAI, vLLM,
+    llama.cpp, LM Studio, ...).
+    """
+
+    name = "openai"
+    default_base_url = "https://api.openai.com/v1"
+    default_model = "gpt-4o-mini"
+    # Ask for a final usage chunk when streaming (stream_options.include_usage)
+    stream_usage_option = True
+
+    def __init__(
+        self,
+        model: str | None = None,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        max_concurrency: int = 4,
+    ):
+        super().__init__(model or self.default_model, max_concurrency)
+        self.base_url = (base_url or self.default_base_url).rstrip("/")
+        self.api_key = api_key
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    @_with_retries
+    def _post(self, payload: dict) -> dict:
+        resp = get_http_client().post(self._url(), json=payload, headers=self._headers())
+        resp.raise_for_status()
+        return resp.json()
+
+    def complete(self, system: str, user: str) -> Completion:
+        with self._slots:
+            data = self._post({"model": self.model, "messages": self._messages(system, user)})
+        usage = data.get("usage") or {}
+        return Completion(
+            content=data["choices"][0]["message"]["content"] or "",
+            id=data.get("id"),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    @_with_retries
+    def _open_stream(self, payload: dict) -> httpx.Response:
+        client = get_http_client()
+        resp = client.send(client.build_request("POST", self._url(), json=payload, headers=self._headers()), stream=True)
+        if resp.is_error:
+            resp.read()
+            resp.close()
+            resp.raise_for_status()
+        return resp
+
+    @contextmanager
+    def _streaming(self, payload: dict):
+        with self._slots:
+            # Only opening the stream is retried; a stream that breaks off
+            # midway is reported to the caller, which keeps what it got
+            resp = self._open_stream(payload)
+            try:
+                yield resp
+            finally:
+                resp.close()
+
+    def stream(self, system: str, user: str, on_usage=None) -> Iterator[str]:
+        payload = {"model": self.model, "messages": self._messages(system, user), "stream": True}
+        if self.stream_usage_option:
+            payload["stream_options"] = {"include_usage": True}
+        with self._streaming(payload) as resp:
+            for line in resp.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                # Groq reports usage under x_groq on the last chunk
+                usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                if usage and on_usage is not None:
+                    on_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                choices = chunk.get("choices") or []
+                if choices:
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+
+
+class GroqBackend(OpenAICompatibleBackend):
+    name = "groq"
+    default_base_url = "https://api.groq.com/openai/v1"
+    default_model = "llama-3.3-70b-versatile"
+    # Usage comes in x_groq without asking
+    stream_usage_option = False
+
+    def __init__(self, model=None, base_url=None, api_key=None, max_concurrency: int = 4):
+        super().__init__(model, base_url, api_key or os.environ.get("GROQ_API_KEY"), max_concurrency)
+
+    @property
+    def cache_id(self) -> str:
+        # Same key as before backends existed, so cached responses stay valid
+        return self.model
+
+
+class OllamaBackend(OpenAICompatibleBackend):
+    """
+    A local Ollama server (see ollama_install.sh), through its native
+    /api/chat endpoint.
+    """
+
+    name = "ollama"
+    default_base_url = "http://localhost:11434"
+    default_model = "llama3.1"
+
+    def _url(self) -> str:
+        return f"{self.base_url}/api/chat"
+
+    def complete(self, system: str, user: str) -> Completion:
+        payload = {"model": self.model, "messages": self._messages(system, user), "stream": False}
+        with self._slots:
+            data = self._post(payload)
+        return Completion(
+            content=(data.get("message") or {}).get("content", ""),
+            prompt_tokens=data.get("prompt_eval_count"),
+            completion_tokens=data.get("eval_count"),
+        )
+
+    def stream(self, system: str, user: str, on_usage=None) -> Iterator[str]:
+        payload = {"model": self.model, "messages": self._messages(system, user), "stream": True}
+        with self._streaming(payload) as resp:
+            for line in resp.iter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                delta = (chunk.get("message") or {}).get("content")
+                if delta:
+                    yield delta
+                if chunk.get("done"):
+                    if on_usage is not None and "eval_count" in chunk:
+                        on_usage(chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+                    return
+
+
+class ClientBackend(LLMBackend):
+    """
+    Wraps an SDK client exposing `chat.completions.create` (Groq, OpenAI), as
+    passed to `entities.set_client`.
+    """
+
+    name = "client"
+
+    def __init__(self, client, model: str = GroqBackend.default_model, max_concurrency: int = 4):
+        super().__init__(model, max_concurrency)
+        self.client = client
+
+    def complete(self, system: str, user: str) -> Completion:
+        with self._slots:
+            resp = self.client.chat.completions.create(messages=self._messages(system, user), model=self.model)
+        usage = getattr(resp, "usage", None)
+        return Completion(
+            content=resp.choices[0].message.content or "",
+            id=getattr(resp, "id", None),
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+    def stream(self, system: str, user: str, on_usage=None) -> Iterator[str]:
+        with self._slots:
+            stream = self.client.chat.completions.create(
+                messages=self._messages(system, user), model=self.model, stream=True
+            )
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None and on_usage is not None:
+                    on_usage(getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+
+BACKENDS = {
+    "groq": GroqBackend,
+    "openai": OpenAICompatibleBackend,
+    "ollama": OllamaBackend,
+}
+
+
+def backend_from_env(api_key: str | None = None) -> LLMBackend:
+    name = LLM_BACKEND.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](
+        model=os.environ.get("REDACT_LLM_MODEL") or None,
+        base_url=os.environ.get("REDACT_LLM_BASE_URL") or None,
+        api_key=os.environ.get("REDACT_LLM_API_KEY") or api_key,
+        max_concurrency=int(os.environ.get("REDACT_LLM_BACKEND_CONCURRENCY", "4")),
+    )
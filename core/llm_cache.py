@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def make_entity_key(text: str, model: str, prompt: str) -> str:
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    return f"{model}:{prompt_hash}:{text_hash}"
+
+
+class EntityCache:
+    """
+    SQLite backed cache of raw LLM entity-extraction responses.
+
+    Entries older than `ttl_seconds` are treated as misses and purged; when
+    more than `max_entries` rows are stored the least recently used ones go.
+    The database is opened on first use in each process, so a cache created
+    at import time is safe to use from forked workers.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entities_accessed ON entities (accessed_at)")
+        conn.commit()
+        return conn
+
+    @contextmanager
+    def _locked(self):
+        if self._pid != os.getpid():
+            # SQLite connections must not be used across fork, and a lock
+            # held by another thread at fork time would never be released
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._conn = None
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            yield self._conn
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._locked() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM entities WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM entities WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE entities SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._locked() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entities (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            conn.execute("DELETE FROM entities WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM entities WHERE key IN ("
+                "SELECT key FROM entities ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._locked() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+    def clear(self):
+        with self._locked() as conn:
+            conn.execute("DELETE FROM entities")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
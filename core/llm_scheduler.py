@@ -0,0 +1,132 @@
+"""
+Admission control for LLM requests.
+
+Every request reserves an estimate of its tokens from a tokens-per-minute
+bucket and one slot from a requests-per-minute bucket before it is sent,
+so bursts stay under the provider's quota instead of turning into 429s.
+While requests wait, the one with the smallest priority value goes first
+(smaller documents first, so their results show up early). Waiting requests
+age, so a large document is not starved by a stream of small ones.
+
+Limits come from REDACT_LLM_RPM and REDACT_LLM_TPM; 0 means unlimited.
+"""
+import itertools
+import os
+import threading
+import time
+
+LLM_RPM = float(os.environ.get("REDACT_LLM_RPM", "0"))
+LLM_TPM = float(os.environ.get("REDACT_LLM_TPM", "0"))
+# Share of the prompt reserved up front for the completion, settled against
+# the reported usage afterwards
+COMPLETION_RATIO = float(os.environ.get("REDACT_LLM_COMPLETION_RATIO", "0.25"))
+# A waiting request's priority is divided by 1 + waited / AGING_SECONDS: half
+# after AGING_SECONDS, a third after twice that, and so on
+AGING_SECONDS = 30.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: about 4 characters per token for
+    ASCII, about one per character for other scripts (Tamil, Devanagari, ...).
+    """
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` / 60 per second up to `per_minute`.
+    Not thread-safe on its own; `LLMScheduler` serialises access.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # Anything larger than the whole bucket goes through once it is full
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        # Negative amounts charge extra when a request used more than reserved
+        if not self.unlimited:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class LLMScheduler:
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.configure(rpm, tpm)
+        self._cond = threading.Condition()
+        self._waiting: dict[int, tuple[float, float]] = {}
+        self._seq = itertools.count()
+
+    def configure(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+
+    def _next_ticket(self) -> int:
+        now = time.monotonic()
+        return min(
+            self._waiting,
+            key=lambda t: (self._waiting[t][0] / (1 + (now - self._waiting[t][1]) / AGING_SECONDS), t),
+        )
+
+    def acquire(self, prompt_tokens: int, priority: float | None = None) -> int:
+        """
+        Block until this request is next in line and the budgets allow it.
+        Returns the number of tokens reserved, to pass to `settle`.
+        """
+        reserved = prompt_tokens + int(prompt_tokens * COMPLETION_RATIO)
+        ticket = next(self._seq)
+        with self._cond:
+            self._waiting[ticket] = (prompt_tokens if priority is None else priority, time.monotonic())
+            try:
+                while True:
+                    if self._next_ticket() == ticket:
+                        delay = max(self._requests.wait_time(1), self._tokens.wait_time(reserved))
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        # Re-check now and then: aging can move this request
+                        # ahead without anyone notifying it
+                        self._cond.wait(1.0)
+            finally:
+                del self._waiting[ticket]
+                self._cond.notify_all()
+            self._requests.take(1)
+            self._tokens.take(reserved)
+        return reserved
+
+    def settle(self, reserved: int, used: int):
+        """Correct the token budget once the provider reports actual usage."""
+        with self._cond:
+            self._tokens.refund(reserved - used)
+            self._cond.notify_all()
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,154 @@
+import re
+
+import numpy as np
+
+# Verhoeff multiplication and permutation tables
+_VERHOEFF_D = np.array([
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+], dtype=np.int8)
+_VERHOEFF_P = np.array([
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 8, 0, 7, 6],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+], dtype=np.int8)
+
+
+def verhoeff_valid(numbers: list[str]) -> np.ndarray:
+    """
+    Verhoeff checksum of many equal-length digit strings at once.
+    """
+    if not numbers:
+        return np.zeros(0, dtype=bool)
+    digits = np.frombuffer("".join(numbers).encode("ascii"), dtype=np.uint8).reshape(len(numbers), -1) - ord("0")
+    checksum = np.zeros(len(numbers), dtype=np.int8)
+    for i in range(digits.shape[1]):
+        checksum = _VERHOEFF_D[checksum, _VERHOEFF_P[i % 8, digits[:, -1 - i]]]
+    return checksum == 0
+
+
+_PATTERN = re.compile(
+    r"""
+    (?P<email>\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b)
+    | (?P<vid>(?<!\d)(?<!\d\s)\d{4}\s?\d{4}\s?\d{4}\s?\d{4}(?![\d]))
+    | (?P<aadhaar>(?<!\d)(?<!\d\s)[2-9]\d{3}\s?\d{4}\s?\d{4}(?!\d)(?!\s\d{4}(?!\d)))
+    | (?P<pan>\b[A-Z]{5}\d{4}[A-Z]\b)
+    | (?P<phone>(?<![\d+])(?:\+91[\s-]?|0)?[6-9]\d{4}[\s-]?\d{5}(?!\d))
+    | (?P<date>\b(?:\d{2}[/.-]\d{2}[/.-]\d{4}|\d{4}-\d{2}-\d{2})\b)
+    | (?P<pin>(?<!\d)(?<!\d\s)[1-8]\d{2}\s?\d{3}(?!\d))
+    """,
+    re.VERBOSE | re.ASCII,
+)
+
+_DATE_CONTEXT = (
+    (re.compile(r"(?i)(birth|dob|d\.o\.b|जन्म|பிறந்த)"), "Date of Birth"),
+    (re.compile(r"(?i)(expir|valid\s*(till|upto|until))"), "Date of Expiry"),
+    (re.compile(r"(?i)(issue)"), "Aadhaar Issue Date"),
+)
+
+# A six digit number is only a PIN code after an address cue or a place name
+# followed by a dash or comma ("Chennai - 600001"), and never after a currency
+_PIN_CONTEXT = re.compile(r"(?i)(\bpin\b|pin\s*code|pincode|postal|\bzip\b|address|\bp\.?\s?o\b|पता|पिन|முகவரி|அஞ்சல்)")
+_PIN_PLACE = re.compile(r"[^\W\d_]{3,}\s*[-,]\s*$")
+_CURRENCY = re.compile(r"(?i)(\brs\.?|\binr|₹)\s*$")
+
+# Types extract_entities splits into single tokens so OCR boxes match them
+_SPLIT_TYPES = {"Phone number", "Government ID Number"}
+
+# Types the local patterns find completely, so the LLM can be skipped when
+# only these are requested. IDs, phone numbers, dates and PIN codes are also
+# written in forms the patterns miss (PINs need nearby context to be told from
+# other six-digit numbers), so they still go to the LLM.
+LOCAL_TYPES = frozenset({
+    "Email",
+    "VID",
+})
+
+
+def _date_type(text: str, start: int) -> str:
+    context = text[max(0, start - 40):start]
+    for pattern, obj_type in _DATE_CONTEXT:
+        if pattern.search(context):
+            return obj_type
+    return "Date"
+
+
+def _is_pin(text: str, start: int) -> bool:
+    before = text[max(0, start - 60):start]
+    if _CURRENCY.search(before):
+        return False
+    return bool(_PIN_CONTEXT.search(before) or _PIN_PLACE.search(before))
+
+
+def detect(text: str) -> list[tuple[int, int, str, str]]:
+    """
+    Structured PII found in `text` as (start, end, value, type) tuples.
+    """
+    matches = []
+    aadhaar = []
+    for match in _PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "aadhaar":
+            aadhaar.append((match.start(), match.end(), value))
+            continue
+        if kind == "email":
+            obj_type = "Email"
+        elif kind == "vid":
+            obj_type = "VID"
+        elif kind in ("pan", "phone"):
+            obj_type = "Government ID Number" if kind == "pan" else "Phone number"
+        elif kind == "date":
+            obj_type = _date_type(text, match.start())
+        elif _is_pin(text, match.start()):
+            obj_type = "PIN Code"
+        else:
+            continue
+        matches.append((match.start(), match.end(), value, obj_type))
+
+    if aadhaar:
+        valid = verhoeff_valid([re.sub(r"\s", "", value) for _, _, value in aadhaar])
+        for (start, end, value), ok in zip(aadhaar, valid):
+            if ok:
+                matches.append((start, end, value, "Government ID Number"))
+
+    matches.sort()
+    return matches
+
+
+def to_identifiers(matches: list[tuple[int, int, str, str]], identifier_cls) -> list:
+    identifiers = []
+    for _, _, value, obj_type in matches:
+        parts = value.split() if obj_type in _SPLIT_TYPES else [value]
+        identifiers.extend(identifier_cls(objValue=part, objType=obj_type) for part in parts)
+    return identifiers
+
+
+def strip_detected(text: str, matches: list[tuple[int, int, str, str]]) -> str:
+    """
+    `text` with the detected spans removed and lines left with only
+    punctuation dropped, i.e. only what still needs the LLM.
+    """
+    pieces = []
+    last = 0
+    for start, end, _, _ in matches:
+        pieces.append(text[last:start])
+        last = end
+    pieces.append(text[last:])
+    remaining = "".join(pieces)
+    return "\n".join(
+        line for line in remaining.splitlines() if not line.strip() or re.search(r"\w", line)
+    )
@@ -0,0 +1,108 @@
+_SEPARATOR = "\x00"
+
+
+class SubstringMatcher:
+    """
+    Answers "is `token` a case-insensitive substring of any target?" in
+    O(len(token)), the same test `is_partial_match(token, target)` does
+    against each target in turn.
+
+    Built once per redaction request as a suffix automaton over the lowercased
+    targets joined with a separator that cannot occur in OCR text.
+    `matching_targets` also says which targets contain the token.
+    """
+
+    def __init__(self, targets: list[str]):
+        self._next: list[dict[str, int]] = [{}]
+        self._link: list[int] = [-1]
+        self._length: list[int] = [0]
+        # Bit i set: the state's strings end inside self.targets[i]
+        self._mask: list[int] = [0]
+        self._masks_ready = False
+        self._memo: dict[str, bool] = {}
+        self._mask_memo: dict[str, int] = {}
+
+        self.targets = list(dict.fromkeys(target.lower() for target in targets if target))
+        last = 0
+        for index, target in enumerate(self.targets):
+            for char in target + _SEPARATOR:
+                last = self._extend(last, char)
+                self._mask[last] |= 1 << index
+
+    def _add_state(self, length: int, transitions: dict[str, int], link: int) -> int:
+        self._next.append(transitions)
+        self._link.append(link)
+        self._length.append(length)
+        self._mask.append(0)
+        return len(self._length) - 1
+
+    def _extend(self, last: int, char: str) -> int:
+        current = self._add_state(self._length[last] + 1, {}, 0)
+        state = last
+        while state != -1 and char not in self._next[state]:
+            self._next[state][char] = current
+            state = self._link[state]
+
+        if state != -1:
+            target = self._next[state][char]
+            if self._length[state] + 1 == self._length[target]:
+                self._link[current] = target
+            else:
+                clone = self._add_state(self._length[state] + 1, dict(self._next[target]), self._link[target])
+                while state != -1 and self._next[state].get(char) == target:
+                    self._next[state][char] = clone
+                    state = self._link[state]
+                self._link[target] = clone
+                self._link[current] = clone
+        return current
+
+    def _walk(self, token: str) -> int | None:
+        state = 0
+        for char in token.lower():
+            if char == _SEPARATOR:
+                return None
+            state = self._next[state].get(char)
+            if state is None:
+                return None
+        return state
+
+    def _propagate_masks(self):
+        # A state's end positions include those of every state linking to it
+        for state in sorted(range(1, len(self._length)), key=self._length.__getitem__, reverse=True):
+            self._mask[self._link[state]] |= self._mask[state]
+        self._masks_ready = True
+
+    def matching_targets(self, token: str) -> list[int]:
+        """Indices into `self.targets` of every target containing `token`."""
+        mask = self._mask_memo.get(token)
+        if mask is None:
+            if not self._masks_ready:
+                self._propagate_masks()
+            state = self._walk(token)
+            mask = 0 if state is None else self._mask[state]
+            self._mask_memo[token] = mask
+
+        indices = []
+        while mask:
+            low = mask & -mask
+            indices.append(low.bit_length() - 1)
+            mask ^= low
+        return indices
+
+    def contains(self, token: str) -> bool:
+        result = self._memo.get(token)
+        if result is not None:
+            return result
+
+        state = 0
+        result = True
+        for char in token.lower():
+            if char == _SEPARATOR:
+                result = False
+                break
+            state = self._next[state].get(char)
+            if state is None:
+                result = False
+                break
+        self._memo[token] = result
+        return result
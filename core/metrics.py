@@ -0,0 +1,195 @@
+"""
+Lightweight timing spans, counters and histograms for the hot paths.
+
+Disabled unless REDACT_METRICS=1; then `span` and `inc` are no-ops that cost a
+function call. When enabled, `export()` writes REDACT_METRICS_FILE as
+Prometheus text (.prom/.txt) or JSON (.json). Metrics are per process;
+process-pool tasks are run through `collect`, which hands what the worker
+recorded back with the result for the parent to `merge`.
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("REDACT_METRICS", "0") == "1"
+METRICS_FILE = os.environ.get("REDACT_METRICS_FILE", "redact_metrics.prom")
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters: dict[tuple, float] = {}
+_histograms: dict[tuple, dict] = {}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def _inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+            _histograms[key] = histogram
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value
+
+
+@contextmanager
+def _span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe("redact_stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _null_span(stage: str):
+    return _NULL_SPAN
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def enable(enabled: bool = True):
+    global ENABLED, span, inc, observe
+    ENABLED = enabled
+    span = _span if enabled else _null_span
+    inc = _inc if enabled else _noop
+    observe = _observe if enabled else _noop
+
+
+span = _null_span
+inc = _noop
+observe = _noop
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels: tuple, extra: dict | None = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _counters.items()]
+        histograms = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "buckets": dict(zip(map(str, DURATION_BUCKETS), h["buckets"])),
+                "count": h["count"],
+                "sum": h["sum"],
+            }
+            for (name, labels), h in _histograms.items()
+        ]
+    return {"counters": counters, "histograms": histograms}
+
+
+def merge(data: dict | None):
+    """Add a `snapshot()` taken in another process to this one's metrics."""
+    if not data:
+        return
+    with _lock:
+        for counter in data["counters"]:
+            key = _key(counter["name"], counter["labels"])
+            _counters[key] = _counters.get(key, 0) + counter["value"]
+        for h in data["histograms"]:
+            key = _key(h["name"], h["labels"])
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+                _histograms[key] = histogram
+            for i, count in enumerate(h["buckets"].values()):
+                histogram["buckets"][i] += count
+            histogram["count"] += h["count"]
+            histogram["sum"] += h["sum"]
+
+
+def collect(fn, /, *args, **kwargs) -> tuple:
+    """
+    Run `fn` as a process-pool task and return (result, snapshot of the
+    metrics it recorded), or (result, None) when metrics are off. The
+    worker's metrics are cleared first, so what it inherited across fork or
+    recorded for an earlier task is not merged twice.
+    """
+    if not ENABLED:
+        return fn(*args, **kwargs), None
+    reset()
+    result = fn(*args, **kwargs)
+    return result, snapshot()
+
+
+def to_prometheus() -> str:
+    lines = []
+    typed = set()
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name}_total counter")
+                typed.add(name)
+            lines.append(f"{name}_total{_format_labels(labels)} {value}")
+        for (name, labels), h in sorted(_histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip(DURATION_BUCKETS, h["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {h['count']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {h['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {h['sum']}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path: str | None = None):
+    if not ENABLED:
+        return
+    path = path or METRICS_FILE
+    payload = json.dumps(snapshot(), indent=2) if path.endswith(".json") else to_prometheus()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _export_at_exit():
+    # Pool workers would overwrite the parent's file with their partial view
+    if multiprocessing.parent_process() is None:
+        export()
+
+
+enable(ENABLED)
+atexit.register(_export_at_exit)
@@ -1,12 +1,11 @@
 import cv2
 
+from core.face_detection import detect_faces
+
 
 def is_human_image(pic: cv2.typing.MatLike):
-    gray = cv2.cvtColor(pic, cv2.COLOR_BGR2GRAY)
-    face_cascade = cv2.CascadeClassifier("./haarcascade_frontalface_default.xml")
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-    return faces
+    return detect_faces(pic)
 
 
 BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
\ No newline at end of file
+WHITE = (255, 255, 255)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+def make_ocr_key(image_bytes: bytes, languages: str, config: str = "") -> str:
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    params = hashlib.sha256(f"{languages}\0{config}".encode("utf-8")).hexdigest()[:16]
+    return f"{digest}-{params}"
+
+
+# Eviction trims the disk tier to this fraction of its limit, so the
+# directory is not listed again on the very next write
+DISK_LOW_WATER = 0.9
+
+
+class OcrCache:
+    """
+    Two tier cache for OCR results keyed by image content, languages and config.
+
+    The memory tier is an LRU holding at most `max_entries` results, or as many
+    as the last `reserve()` asked for (up to `max_reserved`) so every page of a
+    long scan is still there when it is redacted. The disk tier is only used
+    when `cache_dir` is given, as it writes the recognised text to disk. Its size is tracked as files
+    are written, and once it passes `max_disk_bytes` the least recently used
+    files are evicted down to DISK_LOW_WATER of the limit. A failed disk write
+    is logged and leaves the result in memory only.
+    Results are stored serialized, so callers get a fresh copy they may mutate.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        cache_dir: str | None = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        max_reserved: int = 1000,
+    ):
+        self.max_entries = max_entries
+        self.max_reserved = max_reserved
+        self._capacity = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes on disk, counted on the first write
+        self._disk_bytes: int | None = None
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                logging.warning(f"OCR cache directory {cache_dir} is not usable, caching in memory only: {e}")
+                self.cache_dir = None
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key: str, payload: str):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._capacity:
+            self._memory.popitem(last=False)
+
+    def reserve(self, count: int):
+        """Size the memory tier to hold `count` results, e.g. every page of a document."""
+        with self._lock:
+            self._capacity = max(self.max_entries, min(count, self.max_reserved))
+
+    def get(self, key: str):
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                return json.loads(payload)
+
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            self._remember(key, payload)
+        return json.loads(payload)
+
+    def put(self, key: str, result: dict):
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, payload)
+
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = payload.encode("utf-8")
+        try:
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write OCR cache entry {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._disk_usage()
+            else:
+                self._disk_bytes += len(data) - replaced
+            if self._disk_bytes > self.max_disk_bytes:
+                self._disk_bytes = self._evict_disk()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        try:
+            scan = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entries
+        for entry in scan:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict_disk(self) -> int:
+        """Remove the least recently used files; returns the bytes left."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * DISK_LOW_WATER
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = None
+        if self.cache_dir:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+
+
+ocr_cache = OcrCache(
+    max_entries=int(os.environ.get("REDACT_OCR_CACHE_ENTRIES", "128")),
+    cache_dir=os.environ.get("REDACT_OCR_CACHE_DIR") or None,
+    max_disk_bytes=int(os.environ.get("REDACT_OCR_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    max_reserved=int(os.environ.get("REDACT_OCR_CACHE_MAX_PAGES", "1000")),
+)
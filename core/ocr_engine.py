@@ -0,0 +1,285 @@
+"""
+Tesseract behind a warm, per-process engine.
+
+With tesserocr installed, every process (or thread) keeps a `PyTessBaseAPI`
+per language set loaded between images, so an image costs recognition time
+only instead of a `tesseract` process start, temp files and a traineddata
+reload. Without it, or when its tessdata cannot be loaded, recognition falls
+back to pytesseract. REDACT_OCR_ENGINE forces one (tesserocr or pytesseract).
+
+Before recognition, an orientation/script detection pass (OSD) can drop
+the languages of scripts that are not on the page: a page OSD is sure is
+Tamil is read with `tam+eng` rather than `eng+tam+hin`. OSD only reports the
+dominant script, so Latin pages (which routinely carry names in a second
+script) and unsure results keep every language, and the languages in
+REDACT_OCR_SECONDARY_LANGUAGES (default eng) are always kept. It runs by
+default with tesserocr, where OSD is cheap; on the pytesseract path it costs
+a second tesseract process per image and needs REDACT_OCR_AUTO_LANGUAGES=1.
+REDACT_OCR_AUTO_LANGUAGES=0 turns it off.
+
+`get_ocr_pool` is a long-lived process pool whose workers keep their engines
+across calls, for spreading OCR over cores. Only the tiles of large images
+(`core.tiled_ocr`) go through it. Scanned PDF pages are OCR'd by a pool
+created per document, whose workers keep their engines for that document only.
+"""
+import logging
+import os
+import shlex
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+
+import cv2
+import numpy as np
+import pytesseract
+
+from core.ocr_tokens import OcrTokens
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCR_ENGINE = os.environ.get("REDACT_OCR_ENGINE", "auto")
+OCR_WORKERS = int(os.environ.get("REDACT_OCR_WORKERS", str(os.cpu_count() or 1)))
+AUTO_LANGUAGES = os.environ.get("REDACT_OCR_AUTO_LANGUAGES", "auto")
+# Language sets kept loaded per thread; each eng+tam+hin set is ~100 MB
+ENGINE_CACHE_SIZE = 3
+# OSD runs on a downscaled copy of anything larger
+OSD_MAX_PIXELS = 8_000_000
+# Below this script confidence the page is read with every requested language
+OSD_MIN_SCRIPT_CONF = 5.0
+
+# Tesseract script names to the traineddata that read them
+SCRIPT_LANGUAGES = {
+    "Latin": {"eng"},
+    "Devanagari": {"hin", "mar", "nep", "san"},
+    "Tamil": {"tam"},
+    "Bengali": {"ben", "asm"},
+    "Telugu": {"tel"},
+    "Kannada": {"kan"},
+    "Malayalam": {"mal"},
+    "Gujarati": {"guj"},
+    "Gurmukhi": {"pan"},
+    "Oriya": {"ori"},
+    "Arabic": {"urd", "ara"},
+}
+# Always read alongside the detected script: IDs, e-mails and numbers are Latin
+SECONDARY_LANGUAGES = set(os.environ.get("REDACT_OCR_SECONDARY_LANGUAGES", "eng").split("+"))
+
+
+def find_tesseract() -> str:
+    cmd = os.environ.get("REDACT_TESSERACT_CMD") or shutil.which("tesseract")
+    if cmd:
+        return cmd
+    for candidate in ("/opt/homebrew/bin/tesseract", "/usr/local/bin/tesseract", "/usr/bin/tesseract"):
+        if os.path.exists(candidate):
+            return candidate
+    return "tesseract"
+
+
+pytesseract.pytesseract.tesseract_cmd = find_tesseract()
+
+
+def _parse_config(config: str) -> tuple[int | None, int | None, dict] | None:
+    """
+    (psm, oem, variables) from a tesseract command line config, or None if it
+    uses anything tesserocr cannot express.
+    """
+    psm = oem = None
+    variables = {}
+    args = shlex.split(config)
+    while args:
+        arg = args.pop(0)
+        if arg in ("--psm", "--oem") and args:
+            value = int(args.pop(0))
+            if arg == "--psm":
+                psm = value
+            else:
+                oem = value
+        elif arg == "-c" and args and "=" in args[0]:
+            name, value = args.pop(0).split("=", 1)
+            variables[name] = value
+        else:
+            return None
+    return psm, oem, variables
+
+
+class _Engines(threading.local):
+    """`PyTessBaseAPI` instances are not thread-safe, so each thread gets its own."""
+
+    def __init__(self):
+        self.apis: OrderedDict[tuple, object] = OrderedDict()
+
+    def get(self, languages: str, oem: int | None = None, variables: dict | None = None):
+        # Variables stick to an API once set, so they are part of its key
+        key = (languages, oem, tuple(sorted((variables or {}).items())))
+        if key in self.apis:
+            self.apis.move_to_end(key)
+            return self.apis[key]
+
+        prefix = os.environ.get("TESSDATA_PREFIX")
+        kwargs = {"lang": languages}
+        if prefix:
+            kwargs["path"] = prefix.rstrip("/") + "/"
+        if oem is not None:
+            kwargs["oem"] = oem
+        try:
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+        except RuntimeError:
+            if OCR_ENGINE == "tesserocr":
+                raise
+            logging.warning(f"tesserocr could not load {languages!r}, falling back to pytesseract")
+            api = None
+        else:
+            for name, value in key[2]:
+                api.SetVariable(name, value)
+
+        self.apis[key] = api
+        while len(self.apis) > ENGINE_CACHE_SIZE:
+            _, old = self.apis.popitem(last=False)
+            if old is not None:
+                old.End()
+        return api
+
+
+_engines = _Engines()
+
+
+def _use_tesserocr() -> bool:
+    return tesserocr is not None and OCR_ENGINE != "pytesseract"
+
+
+def _set_image(api, img: np.ndarray):
+    if img.ndim == 2:
+        data = np.ascontiguousarray(img)
+        api.SetImageBytes(data.tobytes(), data.shape[1], data.shape[0], 1, data.shape[1])
+    else:
+        data = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        api.SetImageBytes(data.tobytes(), data.shape[1], data.shape[0], 3, data.shape[1] * 3)
+
+
+def _tesserocr_data(api, img: np.ndarray, psm: int | None) -> dict:
+    """Word level results in the shape of pytesseract's `Output.DICT`."""
+    api.SetPageSegMode(tesserocr.PSM.AUTO if psm is None else psm)
+    _set_image(api, img)
+    api.Recognize()
+
+    data = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+    iterator = api.GetIterator()
+    if iterator is None:
+        return data
+    level = tesserocr.RIL.WORD
+    for word in tesserocr.iterate_level(iterator, level):
+        box = word.BoundingBox(level)
+        text = word.GetUTF8Text(level)
+        if box is None or not text:
+            continue
+        x0, y0, x1, y1 = box
+        data["text"].append(text)
+        data["conf"].append(word.Confidence(level))
+        data["left"].append(x0)
+        data["top"].append(y0)
+        data["width"].append(x1 - x0)
+        data["height"].append(y1 - y0)
+    return data
+
+
+def recognize(img: np.ndarray, languages: str, config: str = "") -> OcrTokens:
+    """Words of `img` (BGR or greyscale) with conf > 0."""
+    if _use_tesserocr():
+        parsed = _parse_config(config)
+        if parsed is not None:
+            psm, oem, variables = parsed
+            api = _engines.get(languages, oem, variables)
+            if api is not None:
+                return OcrTokens.from_tesseract(_tesserocr_data(api, img, psm))
+
+    ocr_data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang=languages, config=config)
+    return OcrTokens.from_tesseract(ocr_data)
+
+
+def _osd_view(img: np.ndarray) -> np.ndarray:
+    pixels = img.shape[0] * img.shape[1]
+    if pixels <= OSD_MAX_PIXELS:
+        return img
+    scale = (OSD_MAX_PIXELS / pixels) ** 0.5
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def detect_script(img: np.ndarray) -> tuple[str, float] | None:
+    """(script name, confidence) of the dominant script, or None if OSD failed."""
+    img = _osd_view(img)
+    if _use_tesserocr():
+        api = _engines.get("osd")
+        if api is not None:
+            api.SetPageSegMode(tesserocr.PSM.OSD_ONLY)
+            _set_image(api, img)
+            result = api.DetectOrientationScript()
+            if not result:
+                return None
+            return result["script_name"], float(result["script_conf"])
+
+    try:
+        result = pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT)
+    except pytesseract.TesseractError:
+        # Too little text to tell, or no osd.traineddata
+        return None
+    return result["script"], float(result["script_conf"])
+
+
+def _auto_languages() -> bool:
+    if AUTO_LANGUAGES == "auto":
+        return _use_tesserocr()
+    return AUTO_LANGUAGES != "0"
+
+
+def select_languages(img: np.ndarray, languages: str) -> str:
+    """
+    Narrow `languages` ("eng+tam+hin") to the dominant non-Latin script OSD
+    finds on the page plus SECONDARY_LANGUAGES; the full set when OSD is
+    off, fails, is unsure or finds Latin.
+    """
+    requested = languages.split("+")
+    if not _auto_languages() or len(requested) < 2:
+        return languages
+
+    detected = detect_script(img)
+    if detected is None or detected[1] < OSD_MIN_SCRIPT_CONF:
+        return languages
+    script = detected[0]
+    if script == "Latin" or script not in SCRIPT_LANGUAGES:
+        return languages
+    wanted = SCRIPT_LANGUAGES[script] | SECONDARY_LANGUAGES
+    selected = [lang for lang in requested if lang in wanted]
+    return "+".join(selected) if selected else languages
+
+
+def _warm_up(languages: str):
+    # Load the default models once when the worker starts, not on its first image
+    if _use_tesserocr():
+        _engines.get(languages)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool(languages: str = "eng+tam+hin") -> ProcessPoolExecutor:
+    global _pool, _pool_pid, _pool_lock
+    if _pool_pid != os.getpid():
+        # A pool inherited across fork (redact_many children, scanned-page
+        # workers) belongs to the parent; submitting to it hangs
+        _pool = None
+        _pool_pid = os.getpid()
+        _pool_lock = threading.Lock()
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_warm_up, initargs=(languages,))
+            # A pool worker joins its children on exit, so stop ours first (and
+            # before the queues close their feeder threads at priority 10)
+            util.Finalize(_pool, _pool.shutdown, kwargs={"cancel_futures": True}, exitpriority=20)
+    return _pool
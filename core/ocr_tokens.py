@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class OcrTokens:
+    """
+    Columnar view of OCR words: an (n, 4) int32 array of x0, y0, x1, y1 boxes
+    and a parallel array of strings.
+
+    The cached/serialised OCR format stays `{"result": [{"details": [...]}]}`;
+    this is what the post-processing works on.
+    """
+
+    __slots__ = ("boxes", "text")
+
+    def __init__(self, boxes: np.ndarray, text: np.ndarray):
+        self.boxes = boxes
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @classmethod
+    def from_tesseract(cls, ocr_data: dict, min_conf: float = 0) -> "OcrTokens":
+        """
+        Keep the words of a pytesseract `Output.DICT` with conf > `min_conf`
+        and non-blank text.
+        """
+        text = np.asarray(ocr_data["text"], dtype=str)
+        if not len(text):
+            return cls.empty()
+        conf = np.asarray(ocr_data["conf"], dtype=float)
+        keep = (conf > min_conf) & (np.char.str_len(np.char.strip(text)) > 0)
+
+        left = np.asarray(ocr_data["left"], dtype=np.int32)[keep]
+        top = np.asarray(ocr_data["top"], dtype=np.int32)[keep]
+        width = np.asarray(ocr_data["width"], dtype=np.int32)[keep]
+        height = np.asarray(ocr_data["height"], dtype=np.int32)[keep]
+        boxes = np.column_stack((left, top, left + width, top + height))
+        return cls(boxes, text[keep])
+
+    @classmethod
+    def from_details(cls, details: list[dict]) -> "OcrTokens":
+        if not details:
+            return cls.empty()
+        boxes = np.array([d["coordinates"] for d in details], dtype=np.int32).reshape(-1, 4)
+        text = np.array([d["value"] for d in details], dtype=str)
+        return cls(boxes, text)
+
+    @classmethod
+    def empty(cls) -> "OcrTokens":
+        return cls(np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=str))
+
+    @classmethod
+    def concat(cls, parts: list["OcrTokens"]) -> "OcrTokens":
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        return cls(np.concatenate([part.boxes for part in parts]), np.concatenate([part.text for part in parts]))
+
+    def take(self, index) -> "OcrTokens":
+        return OcrTokens(self.boxes[index], self.text[index])
+
+    def to_details(self) -> list[dict]:
+        return [
+            {"value": value, "coordinates": box}
+            for value, box in zip(self.text.tolist(), self.boxes.tolist())
+        ]
+
+    def char_stats(self) -> tuple[float, float]:
+        """
+        Half the smallest word height (line clustering tolerance) and the
+        average character width (horizontal spacing unit).
+        """
+        heights = np.abs(self.boxes[:, 3] - self.boxes[:, 1])
+        min_height = min(1000, int(heights.min()))
+        widths = self.boxes[:, 2] - self.boxes[:, 0]
+        chars = int(np.char.str_len(self.text).sum())
+        return min_height / 2, float(widths.sum() // chars)
+
+    def line_ids(self, tolerance: float) -> np.ndarray:
+        """
+        Group words into lines by vertical centre: sorted distinct centres
+        more than `tolerance` apart start a new line.
+        """
+        centers = (self.boxes[:, 1] + self.boxes[:, 3]) / 2
+        unique_centers = np.unique(centers)
+        starts = np.concatenate(([0], np.cumsum(np.diff(unique_centers) > tolerance)))
+        return starts[np.searchsorted(unique_centers, centers)]
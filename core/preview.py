@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import fitz
+
+THUMBNAIL_CACHE_ENTRIES = int(os.environ.get("REDACT_THUMBNAIL_CACHE_ENTRIES", "64"))
+
+
+class ThumbnailCache:
+    """
+    LRU of rendered PNG page thumbnails keyed by (file hash, page, zoom).
+
+    Shared by all sessions; a thumbnail of a given file content is the same
+    whoever asks for it.
+    """
+
+    def __init__(self, max_entries: int = THUMBNAIL_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+            return png
+
+    def put(self, key: tuple, png: bytes):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+thumbnail_cache = ThumbnailCache()
+
+# (path, size, mtime) -> (sha256, page count), so a rerun doesn't rehash or
+# reopen a file that hasn't changed
+_file_info: OrderedDict[tuple, tuple[str, int]] = OrderedDict()
+_file_info_lock = threading.Lock()
+
+
+def _stat_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def pdf_info(path: str) -> tuple[str, int]:
+    key = _stat_key(path)
+    with _file_info_lock:
+        info = _file_info.get(key)
+    if info is not None:
+        return info
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    with fitz.open(path) as doc:
+        info = (sha.hexdigest(), doc.page_count)
+
+    with _file_info_lock:
+        _file_info[key] = info
+        while len(_file_info) > THUMBNAIL_CACHE_ENTRIES:
+            _file_info.popitem(last=False)
+    return info
+
+
+def page_count(path: str) -> int:
+    return pdf_info(path)[1]
+
+
+def render_thumbnail(path: str, page_number: int, zoom: float = 1.0) -> bytes:
+    """
+    PNG of one PDF page at `zoom` (1.0 = 72 dpi). Only that page is rendered.
+    """
+    digest, count = pdf_info(path)
+    if not 0 <= page_number < count:
+        raise IndexError(f"Page {page_number + 1} out of range (1-{count})")
+
+    key = (digest, page_number, round(zoom, 3))
+    png = thumbnail_cache.get(key)
+    if png is not None:
+        return png
+
+    with fitz.open(path) as doc:
+        pix = doc[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        png = pix.tobytes("png")
+    thumbnail_cache.put(key, png)
+    return png
@@ -0,0 +1,107 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import metrics
+from core.handle_images import search_replace_in_image
+from core.handle_pdf import search_replace_in_pdf
+from core.handle_scanned_pdf import SCAN_WORKERS, search_replace_in_scanned_pdf
+from core.redaction_plan import RedactionPlan, apply_plan
+
+
+def search_replace(
+    file_bytes: bytes,
+    words: list[str],
+    file_name: str,
+    remove_picture: bool,
+    file_type: str,
+    output_dir: str = ".",
+    plan: RedactionPlan | None = None,
+    types: list[str] | None = None,
+    workers: int = SCAN_WORKERS,
+) -> str:
+    """
+    Redact an upload straight from its bytes and write the result to
+    `output_dir`. Nothing else touches the disk.
+
+    With a precomputed `plan`, the boxes of the selected `types` are burnt in
+    directly and `words` is ignored. `workers` sizes the page pool of a
+    scanned PDF.
+    """
+    red_file_name, red_file_ext = os.path.basename(file_name).rsplit(".", 1)
+    red_file_name = os.path.join(output_dir, f"{red_file_name}_redacted.{red_file_ext}")
+
+    redacted_file_path = None
+
+    if plan is not None:
+        redacted_file_path = apply_plan(file_bytes, plan, types or [], remove_picture, red_file_name, workers)
+        if redacted_file_path is None:
+            raise ValueError("Failed to obtain a valid redacted file path.")
+        return redacted_file_path
+
+    match file_type:
+        case "pdf":
+            redacted_file_path = search_replace_in_pdf(
+                file_bytes, words, remove_picture, red_file_name
+            )
+        case "scanned_pdf":
+            redacted_file_path = search_replace_in_scanned_pdf(
+                file_bytes, words, remove_picture, red_file_name, workers=workers
+            )
+        case "image":
+            redacted_file_path = search_replace_in_image(
+                file_bytes, words, remove_picture, red_file_name
+            )
+        case _:
+            raise ValueError("Invalid file type")
+
+    if redacted_file_path is None:
+        raise ValueError("Failed to obtain a valid redacted file path.")
+
+    return redacted_file_path
+
+
+def redact_many(jobs: list[dict], max_workers: int | None = None, on_done=None) -> list[tuple[str | None, Exception | None]]:
+    """
+    Run `search_replace(**job)` for every job across a process pool.
+
+    Returns (path, error) pairs in the same order as `jobs`; a failing file
+    gets its exception instead of aborting the batch. `on_done(index, path,
+    error)` is called on the calling thread as each file finishes.
+    """
+    results: list[tuple[str | None, Exception | None]] = [(None, None)] * len(jobs)
+    if not jobs:
+        return results
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers == 1:
+        for i, job in enumerate(jobs):
+            try:
+                results[i] = (search_replace(**job), None)
+            except Exception as e:
+                logging.error(f"Failed to redact {job['file_name']}: {e}")
+                results[i] = (None, e)
+            if on_done is not None:
+                on_done(i, *results[i])
+        return results
+
+    # Each file process runs its own page pool for scanned PDFs; share the
+    # CPUs between them instead of starting max_workers * SCAN_WORKERS
+    page_workers = max(1, SCAN_WORKERS // max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(metrics.collect, search_replace, **{"workers": page_workers, **job}): i
+            for i, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                path, recorded = future.result()
+                metrics.merge(recorded)
+                results[i] = (path, None)
+            except Exception as e:
+                logging.error(f"Failed to redact {jobs[i]['file_name']}: {e}")
+                results[i] = (None, e)
+            if on_done is not None:
+                on_done(i, *results[i])
+    return results
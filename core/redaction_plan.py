@@ -0,0 +1,76 @@
+from collections.abc import Iterable
+
+from core.handle_images import burn_in_image, locate_in_image
+from core.handle_pdf import burn_in_pdf, locate_in_pdf
+from core.handle_scanned_pdf import SCAN_DPI, SCAN_WORKERS, burn_in_scanned_pdf, locate_in_scanned_pdf
+
+
+class RedactionPlan:
+    """
+    Where every extracted identifier sits in one file, computed once after
+    extraction: {type: {value: [(page, x0, y0, x1, y1), ...]}}.
+
+    Boxes are PDF points for text PDFs and OCR pixels (at `dpi` for scanned
+    PDFs) otherwise. Redacting a different set of types only filters the plan
+    and burns the boxes in; nothing is searched or OCR'd again.
+    """
+
+    def __init__(self, file_type: str, regions: dict[str, dict[str, list[tuple]]], dpi: int = SCAN_DPI):
+        self.file_type = file_type
+        self.regions = regions
+        self.dpi = dpi
+
+    def boxes_for(self, types: Iterable[str]) -> dict[int, list[tuple]]:
+        boxes: dict[int, dict[tuple, None]] = {}
+        for obj_type in types:
+            for locations in self.regions.get(getattr(obj_type, "value", obj_type), {}).values():
+                for page, *box in locations:
+                    boxes.setdefault(page, {})[tuple(box)] = None
+        return {page: list(page_boxes) for page, page_boxes in boxes.items()}
+
+
+def build_plan(file_bytes: bytes, file_type: str, identifiers: Iterable[tuple[str, str]]) -> RedactionPlan:
+    """
+    Locate every (value, type) pair in the file. Types may be plain strings
+    or `IdentifierType` members.
+    """
+    values_by_type: dict[str, list[str]] = {}
+    for value, obj_type in identifiers:
+        values_by_type.setdefault(getattr(obj_type, "value", obj_type), []).append(value)
+    words = list(dict.fromkeys(value for values in values_by_type.values() for value in values))
+
+    match file_type:
+        case "pdf":
+            locations = locate_in_pdf(file_bytes, words)
+        case "scanned_pdf":
+            locations = locate_in_scanned_pdf(file_bytes, words)
+        case "image":
+            locations = locate_in_image(file_bytes, words)
+        case _:
+            raise ValueError("Invalid file type")
+
+    regions = {
+        obj_type: {value: locations.get(value, []) for value in dict.fromkeys(values)}
+        for obj_type, values in values_by_type.items()
+    }
+    return RedactionPlan(file_type, regions)
+
+
+def apply_plan(
+    file_bytes: bytes,
+    plan: RedactionPlan,
+    types: Iterable[str],
+    remove_picture: bool,
+    red_file_name: str | None,
+    workers: int = SCAN_WORKERS,
+):
+    boxes = plan.boxes_for(types)
+    match plan.file_type:
+        case "pdf":
+            return burn_in_pdf(file_bytes, boxes, remove_picture, red_file_name)
+        case "scanned_pdf":
+            return burn_in_scanned_pdf(file_bytes, boxes, remove_picture, red_file_name, dpi=plan.dpi, workers=workers)
+        case "image":
+            return burn_in_image(file_bytes, boxes, remove_picture, red_file_name)
+        case _:
+            raise ValueError("Invalid file type")
@@ -0,0 +1,80 @@
+"""
+Pipeline results for one browser session, keyed by upload file ID.
+
+Streamlit reruns the whole script on every widget interaction. Looking
+results up by the uploader's stable file ID avoids rehashing the file bytes
+on each rerun. Extractions are dropped when their upload is removed or its
+file type changes; the redaction output when the files, the selected types
+or the face option change.
+"""
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import pandas as pd
+
+from core.redaction_plan import RedactionPlan
+
+
+@dataclass
+class Extraction:
+    file_type: str
+    df: pd.DataFrame
+    plan: RedactionPlan | None = None
+    # Extract job on the job API, when the app runs as its client
+    job_id: str | None = None
+
+
+@dataclass
+class RedactionResult:
+    key: tuple
+    paths: list[str]
+    zip_path: str | None = None
+
+
+class SessionStore:
+    def __init__(self):
+        self._extractions: dict[str, Extraction] = {}
+        self._present_types: list[str] | None = None
+        self.redaction: RedactionResult | None = None
+
+    def get_extraction(self, file_id: str, file_type: str) -> Extraction | None:
+        entry = self._extractions.get(file_id)
+        if entry is None or entry.file_type != file_type:
+            return None
+        return entry
+
+    def put_extraction(self, file_id: str, extraction: Extraction) -> Extraction:
+        self._extractions[file_id] = extraction
+        self._present_types = None
+        return extraction
+
+    def retain(self, file_ids: Iterable[str]):
+        """Forget uploads that are no longer in the uploader."""
+        live = set(file_ids)
+        stale = [file_id for file_id in self._extractions if file_id not in live]
+        for file_id in stale:
+            del self._extractions[file_id]
+        if stale:
+            self._present_types = None
+        if not live:
+            self.redaction = None
+
+    def present_types(self) -> list[str]:
+        if self._present_types is None:
+            types = set()
+            for entry in self._extractions.values():
+                if not entry.df.empty:
+                    types.update(entry.df["objType"].unique())
+            self._present_types = sorted(types)
+        return self._present_types
+
+    @staticmethod
+    def redaction_key(files: Iterable[tuple[str, str]], types: Iterable[str], remove_picture: bool) -> tuple:
+        """Everything a redaction depends on: (file ID, file type) pairs in order, types and face option."""
+        return tuple(files), tuple(sorted(types)), remove_picture
+
+    def redaction_for(self, key: tuple) -> RedactionResult | None:
+        """The stored redaction if it was made for `key`; a stale one is dropped."""
+        if self.redaction is not None and self.redaction.key != key:
+            self.redaction = None
+        return self.redaction
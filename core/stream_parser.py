@@ -0,0 +1,60 @@
+import json
+import logging
+
+
+class JsonObjectStreamParser:
+    """
+    Incremental parser for a JSON array of flat objects arriving in pieces.
+
+    `feed` returns every top-level `{...}` object completed by the new text,
+    so a truncated or partly broken response still yields all objects before
+    the damage. Objects the model wrote with single quotes are accepted too.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._quote = None
+        self._escape = False
+        self._current: list[str] = []
+
+    def feed(self, text: str) -> list[dict]:
+        objects = []
+        for char in text:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                continue
+
+            self._current.append(char)
+            if self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in "\"'":
+                self._quote = char
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    parsed = self._parse("".join(self._current))
+                    if parsed is not None:
+                        objects.append(parsed)
+                    self._current = []
+        return objects
+
+    @staticmethod
+    def _parse(raw: str) -> dict | None:
+        for candidate in (raw, raw.replace("'", '"').replace(r'\"', '"')):
+            try:
+                parsed = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+        logging.warning("Skipping malformed entity object in LLM response")
+        return None
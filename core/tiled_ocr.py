@@ -0,0 +1,154 @@
+"""
+OCR of very large images in overlapping tiles.
+
+The image is cut into TILE_SIZE squares overlapping by TILE_OVERLAP pixels
+and the tiles are recognised by the shared OCR worker pool, with at most
+2 * workers tiles copied out at a time. Each tile's word boxes are shifted
+back to image coordinates. A word seen in several tiles is kept once, from
+the tile whose core (the tile up to the middle of each overlap) contains its
+centre. Words cut by a tile edge are dropped unless no tile saw them whole.
+"""
+import os
+from collections import deque
+import numpy as np
+
+from core.ocr_engine import OCR_WORKERS, get_ocr_pool
+from core.ocr_tokens import OcrTokens
+
+TILE_MIN_PIXELS = int(os.environ.get("REDACT_OCR_TILE_MIN_PIXELS", str(16_000_000)))
+TILE_SIZE = int(os.environ.get("REDACT_OCR_TILE_SIZE", "2560"))
+# Should exceed the widest word, so every word lies whole in some tile
+TILE_OVERLAP = int(os.environ.get("REDACT_OCR_TILE_OVERLAP", "384"))
+TILE_WORKERS = int(os.environ.get("REDACT_OCR_TILE_WORKERS", str(OCR_WORKERS)))
+# Seconds to wait for one tile before giving up on the image
+TILE_TIMEOUT = float(os.environ.get("REDACT_OCR_TILE_TIMEOUT", "300"))
+# Boxes this close to an inner tile edge are treated as cut
+EDGE_MARGIN = 2
+
+
+def should_tile(img: np.ndarray, min_pixels: int = TILE_MIN_PIXELS) -> bool:
+    return min_pixels > 0 and img.shape[0] * img.shape[1] >= min_pixels
+
+
+def _axis_spans(length: int, tile_size: int, overlap: int) -> list[tuple[int, int, float, float]]:
+    """
+    (start, end, core_start, core_end) along one axis. Cores split every
+    overlap down the middle, so they partition the axis.
+    """
+    if length <= tile_size:
+        return [(0, length, 0, length)]
+    step = max(1, tile_size - overlap)
+    starts = list(range(0, length - tile_size, step)) + [length - tile_size]
+    ends = [start + tile_size for start in starts]
+    cores = [0] + [(ends[i] + starts[i + 1]) / 2 for i in range(len(starts) - 1)] + [length]
+    return [(starts[i], ends[i], cores[i], cores[i + 1]) for i in range(len(starts))]
+
+
+def make_tiles(height: int, width: int, tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP) -> list[tuple]:
+    """
+    ((x0, y0, x1, y1), core) pairs covering the image, neighbours sharing at
+    least `overlap` pixels; the cores partition the image.
+    """
+    return [
+        ((x0, y0, x1, y1), (cx0, cy0, cx1, cy1))
+        for y0, y1, cy0, cy1 in _axis_spans(height, tile_size, overlap)
+        for x0, x1, cx0, cx1 in _axis_spans(width, tile_size, overlap)
+    ]
+
+
+def _ocr_tile(ocr_fn, tile: np.ndarray, origin: tuple[int, int], languages: str, config: str) -> OcrTokens:
+    tokens = ocr_fn(tile, languages, config)
+    tokens.boxes = tokens.boxes + np.array([origin[0], origin[1], origin[0], origin[1]], dtype=np.int32)
+    return tokens
+
+
+def _run_windowed(jobs, workers: int):
+    if workers <= 1:
+        for job in jobs:
+            yield _ocr_tile(*job)
+        return
+
+    # The shared OCR pool's workers already have the models loaded
+    executor = get_ocr_pool()
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(_ocr_tile, *job))
+        if len(pending) >= workers * 2:
+            yield pending.popleft().result(timeout=TILE_TIMEOUT)
+    while pending:
+        yield pending.popleft().result(timeout=TILE_TIMEOUT)
+
+
+def _select(tokens: OcrTokens, tile: tuple, core: tuple, bounds: tuple) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Masks of this tile's tokens that it owns (whole, centre in its core) and
+    of tokens touching one of its inner edges.
+    """
+    x0, y0, x1, y1 = tile
+    width, height = bounds
+    boxes = tokens.boxes
+    cut = np.zeros(len(tokens), dtype=bool)
+    if x0 > 0:
+        cut |= boxes[:, 0] <= x0 + EDGE_MARGIN
+    if y0 > 0:
+        cut |= boxes[:, 1] <= y0 + EDGE_MARGIN
+    if x1 < width:
+        cut |= boxes[:, 2] >= x1 - EDGE_MARGIN
+    if y1 < height:
+        cut |= boxes[:, 3] >= y1 - EDGE_MARGIN
+
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    inside = (cx >= core[0]) & (cx < core[2]) & (cy >= core[1]) & (cy < core[3])
+    return inside & ~cut, cut
+
+
+def _overlaps_any(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    if not len(boxes) or not len(others):
+        return np.zeros(len(boxes), dtype=bool)
+    ix = np.minimum(boxes[:, None, 2], others[None, :, 2]) - np.maximum(boxes[:, None, 0], others[None, :, 0])
+    iy = np.minimum(boxes[:, None, 3], others[None, :, 3]) - np.maximum(boxes[:, None, 1], others[None, :, 1])
+    return ((ix > 0) & (iy > 0)).any(axis=1)
+
+
+def ocr_tiled(
+    img: np.ndarray,
+    ocr_fn,
+    languages: str,
+    config: str = "",
+    tile_size: int = TILE_SIZE,
+    overlap: int = TILE_OVERLAP,
+    workers: int = TILE_WORKERS,
+) -> OcrTokens:
+    """
+    OCR `img` tile by tile with `ocr_fn(tile, languages, config) -> OcrTokens`
+    (a module-level function, so it can be sent to worker processes).
+    """
+    height, width = img.shape[:2]
+    tiles = make_tiles(height, width, tile_size, overlap)
+
+    jobs = (
+        (ocr_fn, np.ascontiguousarray(img[y0:y1, x0:x1]), (x0, y0), languages, config)
+        for (x0, y0, x1, y1), _ in tiles
+    )
+
+    kept, cut = [], []
+    for (tile, core), tokens in zip(tiles, _run_windowed(jobs, min(workers, len(tiles)))):
+        whole, partial = _select(tokens, tile, core, (width, height))
+        kept.append(tokens.take(whole))
+        cut.append(tokens.take(partial))
+
+    result = OcrTokens.concat(kept)
+    fragments = OcrTokens.concat(cut)
+    if len(fragments):
+        # Words wider than the overlap are cut in every tile; keep one
+        # fragment rather than lose the word
+        fragments = fragments.take(~_overlaps_any(fragments.boxes, result.boxes))
+        keep = []
+        for i in range(len(fragments)):
+            if not keep or not _overlaps_any(fragments.boxes[i:i + 1], fragments.boxes[keep])[0]:
+                keep.append(i)
+        result = OcrTokens.concat([result, fragments.take(np.array(keep, dtype=np.intp))])
+
+    order = np.lexsort((result.boxes[:, 0], result.boxes[:, 1]))
+    return result.take(order)
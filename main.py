@@ -1,31 +1,64 @@
-from enum import Enum
-import tempfile
 import os
 import pandas as pd
 import streamlit as st
 import logging
-from pydantic import BaseModel, ValidationError
-from core import read_pdf, search_replace_in_pdf, read_image, search_replace_in_image
-from groq import Groq
-import json
-import re
-import zipfile
-from prompt import pii_prompt
-from itertools import groupby
-import streamlit.components.v1 as components
-import base64
+from core import (
+    read_pdf,
+    read_image,
+    read_scanned_pdf,
+)
+import time
+from core import metrics
+from core.redaction import redact_many
+from core.redaction_plan import RedactionPlan, build_plan
+from core.entities import extract_entities, set_backend
+from core.archive import ZipBuilder
+from core.file_io import ScratchDir
+from core.llm_backends import LLM_BACKEND, backend_from_env
+from core.preview import page_count, render_thumbnail
+from core.session_store import Extraction, RedactionResult, SessionStore
+from core.jobs_client import API_URL, JobClient
 
 logging.basicConfig(level=logging.INFO)
 
-client = Groq(
-    api_key=st.secrets["groq_api_key"],
-)
+def get_secret(name):
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        return None
 
 st.set_page_config(
     page_title="RE-DACT",
     page_icon="🛡",
 )
 
+# No spinner: on older Streamlit it would be drawn before set_page_config
+@st.cache_resource(show_spinner=False)
+def get_llm_backend():
+    # Groq by default; REDACT_LLM_BACKEND=openai/ollama points at another server
+    return backend_from_env(api_key=get_secret("groq_api_key") if LLM_BACKEND == "groq" else None)
+
+# One backend (and so one concurrency limit) for every session and rerun
+set_backend(get_llm_backend())
+
+@st.cache_resource(show_spinner=False)
+def get_job_client():
+    return JobClient(API_URL)
+
+# With REDACT_API_URL set, extraction and redaction run on the job API's
+# workers (api.py) and this app only submits files and shows results
+job_client = get_job_client() if API_URL else None
+
+# Redacted outputs live in a private directory per browser session, removed
+# when the session ends instead of piling up in the working directory.
+if "scratch_dir" not in st.session_state:
+    st.session_state.scratch_dir = ScratchDir()
+
+# Extraction and redaction results, looked up by upload file ID on reruns
+if "store" not in st.session_state:
+    st.session_state.store = SessionStore()
+store = st.session_state.store
+
 def is_pdf_or_image(file):
     file_ext = os.path.splitext(file.name)[1].lower()
     if file_ext == ".pdf":
@@ -39,168 +72,85 @@ def read_file(file, file_type):
     if file_type is None:
         raise ValueError("Invalid file type")
 
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(file.getvalue())
-        temp_file_path = temp_file.name
-
+    file_bytes = file.getvalue()
     if file_type == "pdf":
-        return read_pdf(temp_file_path)
+        return read_pdf(file_bytes)
+    elif file_type == "scanned_pdf":
+        return read_scanned_pdf(file_bytes)
     elif file_type == "image":
-        return read_image(temp_file_path)
+        return read_image(file_bytes)
     else:
         raise ValueError(f"Unsupported file type: {file_type}")
 
-class IdentifierType(str, Enum):
-    EMAIL = "Email"
-    GOVERNMENT_ID = "Government ID Number"
-    NAME = "Name"
-    PHONE_NUMBER = "Phone number"
-    ADDRESS = "Address"
-    UNKNOWN = "Unknown"
-    ENROLMENT_NO = "Enrolment No."
-    FATHERS_NAME = "Father Name"
-    SURNAME = "Surname"
-    VID = "VID"
-    DATE_OF_BIRTH = "Date of Birth"
-    PLACE_OF_BIRTH = "Place of Birth"
-    DATE_OF_EXPIRY = "Date of Expiry"
-    DATE = "Date"
-    AADHAAR_ISSUE_DATE = "Aadhaar Issue Date"
-    PIN_CODE = "PIN Code"
-    Place_of_Issue = "Place of Issue"
-    SubDistrict="Sub District"
-
-class Identifier(BaseModel):
-    objValue: str
-    objType: IdentifierType
-
-class IdentifiersCollection(BaseModel):
-    identifier: list[Identifier]
-
-def extract_entities(text: str):
-    prompt = pii_prompt
+def get_df(uploaded_file, file_type) -> pd.DataFrame:
+    # Entities are shown as they arrive
+    live_table = st.empty()
+    found = []
+    last_update = 0.0
+
+    def show_partial(identifiers):
+        nonlocal last_update
+        found.extend({"objValue": obj.objValue, "objType": obj.objType.value} for obj in identifiers)
+        if time.monotonic() - last_update >= 0.5:
+            live_table.dataframe(pd.DataFrame(found))
+            last_update = time.monotonic()
 
     try:
-        resp = client.chat.completions.create(
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": text}],
-            model="llama-3.3-70b-versatile",
+        res_dict = extract_entities(
+            read_file(uploaded_file, file_type),
+            on_error=lambda e: st.error(f"Unexpected error occurred during API call: {e}"),
+            on_entities=show_partial,
         )
-
-        logging.info(f"API Response: {resp}")
-
-        resp_data = resp.choices[0].message.content.strip()
-
-        resp_data = resp_data.replace("'", '"')
-        resp_data = resp_data.replace(r'\"', '"')
-
-        try:
-            parsed_data = json.loads(resp_data)
-        except json.JSONDecodeError as e:
-            logging.error(f"Error parsing JSON response: {e}")
-            return []
-
-        identifiers = []
-        for item in parsed_data:
-            obj_value = item.get("value", "")
-            obj_type = item.get("type", "Unknown")
-
-            if obj_type == "Given Name":
-                obj_type = "Name"
-
-            if re.match(r'\d{2}/\d{2}/\d{4}', obj_value) or re.match(r'\d{4}-\d{2}-\d{2}', obj_value):
-                obj_type = "Date of Birth"
-
-            if re.match(r'^\d{4} \d{4} \d{4}$', obj_value):
-                obj_type = "Government ID Number"
-
-            if re.match(r'\d{4}', obj_value):
-                obj_type = "Government ID Number"
-
-            if obj_type in ["Name", "Phone number", "Government ID Number", "Address"]:
-                parts = obj_value.split()
-                for part in parts:
-                    identifier = Identifier(objValue=part, objType=obj_type)
-                    identifiers.append(identifier)
-                    logging.debug(f"Extracted PII: {identifier}")
-
-            else:
-                identifier = Identifier(objValue=obj_value, objType=obj_type)
-                identifiers.append(identifier)
-                logging.debug(f"Extracted PII: {identifier}")
-
-        return identifiers
+        arr = [{"objValue": obj.objValue, "objType": obj.objType.value} for obj in res_dict]
+        return pd.DataFrame(arr)
     except Exception as e:
-        st.error(f"Unexpected error occurred during API call: {e}")
-        logging.error(f"Unexpected error: {e}")
-        return []
-
-def search_replace(file, words: list[str], file_name: str, remove_picture: bool):
-    red_file_name, red_file_ext = file_name.rsplit(".", 1)
-    red_file_name = f"{red_file_name}_redacted.{red_file_ext}"
-    file_type = is_pdf_or_image(file)
-
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(file.getvalue())
-        temp_file_path = temp_file.name
-
-    redacted_file_path = None
-
-    match file_type:
-        case "pdf":
-            redacted_file_path = search_replace_in_pdf(
-                temp_file_path, words, remove_picture, red_file_name
-            )
-        case "image":
-            redacted_file_path = search_replace_in_image(
-                temp_file_path, words, remove_picture, red_file_name
-            )
-        case _:
-            raise ValueError("Invalid file type")
-
-    if redacted_file_path is None:
-        raise ValueError("Failed to obtain a valid redacted file path.")
+        st.error(f"Error while extracting identifiers: {e}")
+        logging.error(f"Error while extracting identifiers: {e}")
+        return pd.DataFrame()
+    finally:
+        live_table.empty()
 
-    return redacted_file_path
+def extract_remote(uploaded_file, file_type) -> tuple[pd.DataFrame, str | None]:
+    live_table = st.empty()
 
-def zip_redacted_files(file_paths: list[str]) -> str:
-    zip_filename = "redacted_files.zip"
-    with zipfile.ZipFile(zip_filename, 'w') as zipf:
-        for file_path in file_paths:
-            zipf.write(file_path, os.path.basename(file_path))
-    return zip_filename
+    def show_partial(progress):
+        if progress.get("entities"):
+            live_table.dataframe(pd.DataFrame(progress["entities"]))
 
-@st.cache_data
-def get_df(uploaded_file, file_type) -> pd.DataFrame:
     try:
-        res_dict = extract_entities(read_file(uploaded_file, file_type))
-        arr = [{"objValue": obj.objValue, "objType": obj.objType.value} for obj in res_dict]
-        return pd.DataFrame(arr)
+        job_id = job_client.submit(
+            "extract", uploaded_file.getvalue(), file_name=uploaded_file.name, file_type=file_type
+        )
+        job = job_client.wait(job_id, on_progress=show_partial)
+        return pd.DataFrame(job["result"]["entities"]), job_id
     except Exception as e:
         st.error(f"Error while extracting identifiers: {e}")
         logging.error(f"Error while extracting identifiers: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
+    finally:
+        live_table.empty()
 
-def show_pdf_in_iframe(file_path, width=700, height=500):
-    with open(file_path, "rb") as f:
-        pdf_bytes = f.read()
-    base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-    pdf_display = f"""
-    <iframe
-        src="data:application/pdf;base64,{base64_pdf}"
-        width="{width}"
-        height="{height}"
-        style="border: none;"
-    >
-    </iframe>
-    """
-    components.html(pdf_display, width=width, height=height)
-
-def show_preview(file_path, small_preview=False):
+def get_plan(uploaded_file, file_type, df) -> RedactionPlan | None:
+    # Located once per file so trying other type selections is only an apply step
+    try:
+        return build_plan(uploaded_file.getvalue(), file_type, zip(df["objValue"], df["objType"]))
+    except Exception as e:
+        logging.error(f"Failed to plan redaction for {uploaded_file.name}: {e}")
+        return None
+
+def preview_pages(file_path):
+    if os.path.splitext(file_path)[1].lower() == ".pdf":
+        return page_count(file_path)
+    return 1
+
+def show_preview(file_path, small_preview=False, page_number=0):
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".pdf":
+        # Only the visible page is rendered; thumbnails are cached by content hash
         width = 300 if small_preview else 700
-        height = 400 if small_preview else 500
-        show_pdf_in_iframe(file_path, width=width, height=height)
+        zoom = 0.75 if small_preview else 1.5
+        st.image(render_thumbnail(file_path, page_number, zoom), width=width)
+        st.caption(f"Page {page_number + 1} of {page_count(file_path)}")
     elif ext in [".png", ".jpg", ".jpeg"]:
         width = 300 if small_preview else None
         st.image(file_path, width=width)
@@ -218,6 +168,9 @@ uploaded_files = st.file_uploader(
 )
 
 file_data_dict = {}
+file_type_dict = {}
+plan_dict = {}
+job_dict = {}
 
 if uploaded_files:
     for uploaded_file in uploaded_files:
@@ -232,12 +185,37 @@ if uploaded_files:
             )
 
             if scanned_pdf == "Yes":
-                file_type = "image"
-        with st.spinner(f"Extracting data from {uploaded_file.name}..."):
-            df = get_df(uploaded_file, file_type)
+                file_type = "scanned_pdf"
+        file_type_dict[uploaded_file.name] = file_type
+
+    store.retain(f.file_id for f in uploaded_files)
+
+    # Smallest files first so the first results show up quickly; the table
+    # below keeps the upload order. Files already extracted this session are
+    # looked up by file ID.
+    extracted = {}
+    for uploaded_file in sorted(uploaded_files, key=lambda f: f.size):
+        file_type = file_type_dict[uploaded_file.name]
+        entry = store.get_extraction(uploaded_file.file_id, file_type)
+        if entry is None:
+            with st.spinner(f"Extracting data from {uploaded_file.name}..."):
+                if job_client is not None:
+                    df, job_id = extract_remote(uploaded_file, file_type)
+                    plan = None
+                else:
+                    df, job_id = get_df(uploaded_file, file_type), None
+                    plan = get_plan(uploaded_file, file_type, df) if not df.empty else None
+            entry = store.put_extraction(uploaded_file.file_id, Extraction(file_type, df, plan, job_id))
+        extracted[uploaded_file.name] = entry
 
-        if not df.empty:
-            file_data_dict[uploaded_file.name] = df
+    for uploaded_file in uploaded_files:
+        entry = extracted[uploaded_file.name]
+        if not entry.df.empty:
+            file_data_dict[uploaded_file.name] = entry.df
+            plan_dict[uploaded_file.name] = entry.plan
+        job_dict[uploaded_file.name] = entry.job_id
+else:
+    store.retain([])
 
 if file_data_dict:
     selected_file = st.selectbox("Select a file to view extracted data", options=list(file_data_dict.keys()))
@@ -253,11 +231,7 @@ else:
     st.info("Please upload files to extract data from.")
 
 if file_data_dict:
-    present_obj_types = set()
-    for df in file_data_dict.values():
-        present_obj_types.update(df["objType"].unique())
-
-    present_obj_types = sorted(present_obj_types)  # Optional: for sorted dropdown
+    present_obj_types = store.present_types()
 
     data_to_redact = st.multiselect(
         "Select data types to redact",
@@ -267,40 +241,128 @@ if file_data_dict:
 
     remove_picture = st.checkbox("Remove Face")
 
+    # Changing the files or the selection hides the previous redaction
+    redaction_key = SessionStore.redaction_key(
+        ((f.file_id, file_type_dict[f.name]) for f in uploaded_files), data_to_redact, remove_picture
+    )
+    store.redaction_for(redaction_key)
+
     if st.button("Redact"):
         if len(data_to_redact) == 0:
             st.error("Please choose some data to redact")
+        elif store.redaction is not None:
+            # Same files and selection as the last run: keep its outputs
+            pass
         else:
-            redacted_file_paths = []
+            scratch_dir = st.session_state.scratch_dir
+            scratch_dir.clear()
+            jobs = []
             for uploaded_file in uploaded_files:
                 file_name = uploaded_file.name
-                df = file_data_dict[file_name]
-                df_red = df[df["objType"].isin(data_to_redact)]
-                with st.spinner(f"Redacting information in {file_name}..."):
-                    redacted_file_path = search_replace(
-                        uploaded_file,
-                        df_red["objValue"].tolist(),
-                        file_name,
-                        remove_picture,
-                    )
-                    redacted_file_paths.append(redacted_file_path)
-
-            # Store redacted paths in session for preview buttons
-            st.session_state.redaction_done = True
+                df = file_data_dict.get(file_name)
+                job = {
+                    "file_bytes": uploaded_file.getvalue(),
+                    "file_name": file_name,
+                    "remove_picture": remove_picture,
+                    "file_type": file_type_dict[file_name],
+                    "types": data_to_redact,
+                }
+                if job_client is not None:
+                    # The API already has the file and its identifiers
+                    job["source"] = job_dict.get(file_name)
+                else:
+                    job["words"] = df[df["objType"].isin(data_to_redact)]["objValue"].tolist() if df is not None else []
+                    job["output_dir"] = scratch_dir.path
+                    job["plan"] = plan_dict.get(file_name)
+                jobs.append(job)
+
+            progress = st.progress(0.0, text=f"Redacting {len(jobs)} files...")
+            finished = 0
+            # The archive grows as files finish rather than being rebuilt on every rerun
+            archive = ZipBuilder(scratch_dir.file("redacted_files.zip")) if len(jobs) > 1 else None
+
+            def report_progress(index, path, error):
+                global finished
+                finished += 1
+                file_name = jobs[index]["file_name"]
+                if error is not None:
+                    st.error(f"Failed to redact {file_name}: {error}")
+                elif archive is not None:
+                    archive.add(path)
+                progress.progress(finished / len(jobs), text=f"Redacted {finished} of {len(jobs)} files ({file_name})")
+
+            try:
+                if job_client is not None:
+                    results = job_client.redact_many(jobs, scratch_dir.path, on_done=report_progress)
+                else:
+                    results = redact_many(jobs, on_done=report_progress)
+            finally:
+                if archive is not None:
+                    archive.close()
+            progress.empty()
+            redacted_file_paths = [path for path, error in results if error is None]
+
+            store.redaction = RedactionResult(
+                redaction_key, redacted_file_paths, archive.path if archive is not None else None
+            )
+            # Redacted paths for the preview buttons
             st.session_state.preview_files = redacted_file_paths
+            st.session_state.zip_file = store.redaction.zip_path
+            st.session_state.modal_preview_index = 0
+            st.session_state.preview_page = 0
+            metrics.export()
+else:
+    store.redaction = None
+
+def prev_page():
+    if st.session_state.preview_page > 0:
+        st.session_state.preview_page -= 1
+    elif st.session_state.modal_preview_index > 0:
+        st.session_state.modal_preview_index -= 1
+        prev_file_path = st.session_state.preview_files[st.session_state.modal_preview_index]
+        st.session_state.preview_page = preview_pages(prev_file_path) - 1
+
+def next_page():
+    file_path = st.session_state.preview_files[st.session_state.modal_preview_index]
+    if st.session_state.preview_page < preview_pages(file_path) - 1:
+        st.session_state.preview_page += 1
+    elif st.session_state.modal_preview_index < len(st.session_state.preview_files) - 1:
+        st.session_state.modal_preview_index += 1
+        st.session_state.preview_page = 0
+
+def show_preview_pager(small_preview=False):
+    # Previous/Next step through the pages of each file, then on to the next file
+    files = st.session_state.preview_files
+    idx = st.session_state.modal_preview_index
+    page = st.session_state.preview_page
+    is_first = idx == 0 and page == 0
+    is_last = idx == len(files) - 1 and page >= preview_pages(files[idx]) - 1
+
+    show_preview(files[idx], small_preview=small_preview, page_number=page)
+
+    col1, col2, col3 = st.columns([1, 6, 1])
+    with col1:
+        st.button("⬅ Previous", key="prev_btn", on_click=prev_page, disabled=is_first)
+    with col3:
+        st.button("Next ➡", key="next_btn", on_click=next_page, disabled=is_last)
+
+if store.redaction is not None:
+    if "modal_preview_index" not in st.session_state:
+        st.session_state.modal_preview_index = 0
+        st.session_state.preview_page = 0
 
-if 'redaction_done' in st.session_state and st.session_state.redaction_done:
     if len(st.session_state.preview_files) == 1:
-        # Single file preview button
-        if st.button("Preview Redacted File"):
+        # Single file preview toggle
+        if st.toggle("Preview Redacted File"):
             st.subheader("Preview Redacted File")
-            show_preview(st.session_state.preview_files[0])
+            show_preview_pager()
 
         # Download button
+        # Streamed from the scratch file rather than kept in memory
         with open(st.session_state.preview_files[0], "rb") as f:
             st.download_button(
                 label="Download Redacted File",
-                data=f.read(),
+                data=f,
                 file_name=os.path.basename(st.session_state.preview_files[0]),
                 mime="application/octet-stream",
             )
@@ -308,40 +370,18 @@ if 'redaction_done' in st.session_state and st.session_state.redaction_done:
     elif len(st.session_state.preview_files) > 1:
         # Multiple files preview all button with expander (acting as a modal)
         with st.expander("Preview All Redacted Files"):
-            # Initialize preview index if not set
-            if "modal_preview_index" not in st.session_state:
-                st.session_state.modal_preview_index = 0
-
-            def prev_file():
-                if st.session_state.modal_preview_index > 0:
-                    st.session_state.modal_preview_index -= 1
-
-            def next_file():
-                if st.session_state.modal_preview_index < len(st.session_state.preview_files) - 1:
-                    st.session_state.modal_preview_index += 1
-
             idx = st.session_state.modal_preview_index
             file_name = os.path.basename(st.session_state.preview_files[idx])
 
             st.markdown(f"### Showing file {idx + 1} of {len(st.session_state.preview_files)}: **{file_name}**")
 
-            show_preview(st.session_state.preview_files[idx], small_preview=True)
-
-            col1, col2, col3 = st.columns([1, 6, 1])
-            with col1:
-                if st.button("⬅ Previous", key="prev_btn"):
-                    prev_file()
-            with col3:
-                if st.button("Next ➡", key="next_btn"):
-                    next_file()
+            show_preview_pager(small_preview=True)
 
         # Download zip of all files
-        zip_file = zip_redacted_files(st.session_state.preview_files)
-
-        with open(zip_file, "rb") as f:
+        with open(st.session_state.zip_file, "rb") as f:
             st.download_button(
                 label="Download All Redacted Files",
-                data=f.read(),
-                file_name=zip_file,
+                data=f,
+                file_name=os.path.basename(st.session_state.zip_file),
                 mime="application/zip",
             )
@@ -0,0 +1,42 @@
+"""
+Worker processes for the job API, run separately from api.py.
+
+    python worker.py [--workers 8] [--jobs-dir jobs]
+
+Start as many as the machine can take; they claim jobs from the same
+REDACT_JOBS_DIR queue as every API instance. The LLM rate limits
+(REDACT_LLM_RPM/TPM) are split between the processes of one command.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+
+from core.jobs import JOBS_DIR, start_workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run redaction job workers.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--jobs-dir", default=JOBS_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes = start_workers(args.workers or os.cpu_count() or 1, args.jobs_dir)
+    logging.info(f"{len(processes)} workers on {os.path.abspath(args.jobs_dir)}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()